@@ -0,0 +1,284 @@
+"""Runs the scenario grids once and stores their result tables.
+
+    python -m artefacts [--year YEAR] [--force]
+
+Tables are written as CSVs under results/<version>/, where the version is
+a hash of the modules in RESULT_MODULES, the inputs below and the
+openfisca-uk version, so the notebooks can load them instead of
+re-simulating until one of those changes. Builds simulate from scratch
+rather than reading the simulation cache. results/ is not committed; run
+`make results` to build it ahead of `make`.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from importlib.metadata import version
+from pathlib import Path
+import pandas as pd
+from openfisca_uk import Microsimulation
+from baseline import BaselineCache
+from charts import intra_decile_graph_data
+from metrics import ImpactReport
+from reform import (
+    WA_adult_UBI,
+    include_UBI_in_means_tests,
+    net_cost,
+    set_PA_for_WA_adults,
+    set_PT,
+)
+from scenarios import run_scenarios
+
+RESULTS_DIR = Path(
+    os.environ.get("UBI_RESULTS_DIR", Path(__file__).parent / "results")
+)
+
+# Every module whose code the result tables depend on.
+RESULT_MODULES = (
+    "artefacts.py",
+    "baseline.py",
+    "charts.py",
+    "means_tests.py",
+    "metrics.py",
+    "reform.py",
+    "scenarios.py",
+    "uncertainty.py",
+)
+
+GRID_COLUMNS = (
+    "Adult PA (£/year)",
+    "Pensioner PA (£/year)",
+    "NI Primary Threshold (£/week)",
+    "UBI for children",
+    "UBI for pensioners",
+    "UBI in means tests",
+)
+
+# Notebook -> scenario label -> reform_df row, in GRID_COLUMNS order.
+GRIDS = {
+    "improvements": {
+        "Baseline": (2500, 12500, 50, False, False, True),
+        "Full PA/PT elimination": (0, 12500, 0, False, False, True),
+        "Include pensioners": (2500, 2500, 50, False, True, True),
+        "Include children": (2500, 12500, 50, True, False, True),
+        "Exclude from means tests": (2500, 12500, 50, False, False, False),
+        "All": (0, 0, 0, True, True, False),
+    },
+    "progressive_improvements": {
+        "Baseline": (12500, 12500, 183, False, False, False),
+        "Budget-neutral Working Group reform": (
+            2500,
+            12500,
+            50,
+            False,
+            False,
+            True,
+        ),
+        "Full PA/PT elimination": (0, 12500, 0, False, False, True),
+        "Include pensioners": (2500, 2500, 50, False, True, True),
+        "Include children": (2500, 12500, 50, True, False, True),
+        "Exclude from means tests": (2500, 12500, 50, False, False, False),
+        "All": (0, 0, 0, True, True, False),
+    },
+}
+
+# The Working Group's reforms: UBI (£/week) -> (adult PA, NI threshold).
+WORKING_GROUP_REFORMS = {
+    45: (4000, 90),
+    60: (2500, 50),
+    75: (2500, 50),
+    95: (2500, 50),
+}
+
+# Net cost left over after the first pass of the PA/PT elimination, which
+# the second pass adds back to the UBI.
+INITIAL_OVERSHOOT = {45: -4.46e9, 60: -2.99e9, 75: -3.19e9, 95: -2.81e9}
+
+IMPROVEMENT_METRICS = {
+    "Poverty rate": "poverty",
+    "Poverty gap": "poverty_gap",
+    "Median household net income": "median",
+    "Inequality": "gini",
+}
+
+
+def reform_grid(name: str) -> pd.DataFrame:
+    return pd.DataFrame.from_dict(
+        GRIDS[name], orient="index", columns=list(GRID_COLUMNS)
+    )
+
+
+def working_group_reform(amount: int) -> tuple:
+    adult_PA, threshold = WORKING_GROUP_REFORMS[amount]
+    return (
+        WA_adult_UBI(amount * 52),
+        set_PA_for_WA_adults(adult_PA),
+        set_PT(threshold),
+        include_UBI_in_means_tests(),
+    )
+
+
+def results_version(year: int = 2020) -> str:
+    inputs = json.dumps(
+        dict(
+            grids=GRIDS,
+            working_group=WORKING_GROUP_REFORMS,
+            overshoot=INITIAL_OVERSHOOT,
+            year=year,
+        ),
+        sort_keys=True,
+    )
+    root = Path(__file__).parent
+    sources = "|".join((root / name).read_text() for name in RESULT_MODULES)
+    return hashlib.sha256(
+        f"{sources}|{inputs}|{version('openfisca-uk')}".encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def format_output(
+    reform_df: pd.DataFrame, results: pd.DataFrame, weekly: bool = False
+) -> pd.DataFrame:
+    # The notebooks' output table: inputs followed by rounded results.
+    def percent(column):
+        return (results[column] * 100).round(1)
+
+    ubi = results["UBI amount"]
+    if weekly:
+        ubi = {"UBI amount (£/week)": (ubi / 52).astype(int)}
+    else:
+        ubi = {"UBI amount": ubi.astype(int)}
+    results_df = pd.DataFrame(
+        {
+            **ubi,
+            "Poverty change (%)": percent("Poverty change"),
+            "Deep poverty change (%)": percent("Deep poverty change"),
+            "Winners (%)": percent("Winners"),
+            "Losers (%)": percent("Losers"),
+            "Inequality change (%)": percent("Inequality change"),
+            "Net cost (£bn/year)": (results["Net cost"] / 1e9).round(1),
+        }
+    )
+    return pd.concat([reform_df, results_df], axis=1)
+
+
+def improvement_metrics(
+    baseline: BaselineCache, new_reform_func, year: int = 2020
+) -> pd.DataFrame:
+    """Changes from each Working Group reform to an improved version.
+
+    `new_reform_func(amount, original_sim)` returns the improved reform
+    for the £`amount`/week reform simulated in original_sim.
+    """
+    rows = {}
+    for amount in WORKING_GROUP_REFORMS:
+        original_sim = Microsimulation(working_group_reform(amount), year=year)
+        new_sim = Microsimulation(
+            new_reform_func(amount, original_sim), year=year
+        )
+        report = ImpactReport.compute(
+            original_sim, new_sim, metrics=tuple(IMPROVEMENT_METRICS.values())
+        )
+        rows[f"£{amount}/week"] = {
+            name: report.change(metric)
+            for name, metric in IMPROVEMENT_METRICS.items()
+        }
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("UBI")
+
+
+def build_results(year: int = 2020, results_dir: Path = RESULTS_DIR) -> Path:
+    baseline = BaselineCache(Microsimulation(year=year))
+    WA_adults = baseline.aggregate("is_WA_adult")
+    tables = {}
+    for name in GRIDS:
+        reform_df = reform_grid(name)
+        results = run_scenarios(
+            reform_df, baseline=baseline, year=year, cache=False
+        )
+        tables[name] = format_output(
+            reform_df, results, weekly=name == "progressive_improvements"
+        )
+    tables["intra_decile"] = intra_decile_graph_data(
+        baseline,
+        *[
+            Microsimulation(working_group_reform(amount), year=year)
+            for amount in WORKING_GROUP_REFORMS
+        ],
+        amounts=tuple(WORKING_GROUP_REFORMS),
+    )
+
+    def eliminate_PA_and_PT(amount, original_sim):
+        new_funding = (
+            set_PA_for_WA_adults(0),
+            set_PT(0),
+            include_UBI_in_means_tests(),
+        )
+        new_sim = Microsimulation(
+            (WA_adult_UBI(amount * 52), *new_funding), year=year
+        )
+        ubi_increase = (
+            net_cost(new_sim, baseline) - net_cost(original_sim, baseline)
+        ) / WA_adults
+        compensation = -INITIAL_OVERSHOOT[amount] / WA_adults
+        return (
+            WA_adult_UBI(amount * 52 + ubi_increase + compensation),
+            *new_funding,
+        )
+
+    def exclude_from_means_tests(amount, original_sim):
+        reform = working_group_reform(amount)
+        new_sim = Microsimulation(reform[:-1], year=year)
+        ubi_increase = (
+            net_cost(new_sim, baseline) - net_cost(original_sim, baseline)
+        ) / WA_adults
+        return (WA_adult_UBI(amount * 52 + ubi_increase), *reform[1:-1])
+
+    tables["pa_pt_elimination"] = improvement_metrics(
+        baseline, eliminate_PA_and_PT, year
+    )
+    tables["means_test_exclusion"] = improvement_metrics(
+        baseline, exclude_from_means_tests, year
+    )
+    path = Path(results_dir) / results_version(year)
+    path.mkdir(parents=True, exist_ok=True)
+    for name, table in tables.items():
+        table.to_csv(path / f"{name}.csv")
+    (path / "manifest.json").write_text(
+        json.dumps(dict(year=year, tables=sorted(tables)), indent=2) + "\n"
+    )
+    return path
+
+
+def load_results(
+    year: int = 2020, results_dir: Path = RESULTS_DIR, rebuild: bool = True
+) -> dict:
+    """The result tables for the current reform.py and inputs, by name.
+
+    They are built first if missing (or, without `rebuild`, a
+    FileNotFoundError is raised).
+    """
+    path = Path(results_dir) / results_version(year)
+    if not (path / "manifest.json").exists():
+        if not rebuild:
+            raise FileNotFoundError(
+                f"No results at {path}; run python -m artefacts."
+            )
+        build_results(year, results_dir)
+    manifest = json.loads((path / "manifest.json").read_text())
+    return {
+        name: pd.read_csv(path / f"{name}.csv", index_col=0)
+        for name in manifest["tables"]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--year", type=int, default=2020)
+    parser.add_argument(
+        "--force", action="store_true", help="Rebuild even if up to date."
+    )
+    args = parser.parse_args()
+    path = RESULTS_DIR / results_version(args.year)
+    if args.force or not (path / "manifest.json").exists():
+        path = build_results(args.year)
+    print(path)
@@ -0,0 +1,204 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+try:
+    from openfisca_uk import CountryTaxBenefitSystem, Microsimulation
+except ImportError:  # The caches and index themselves only need numpy.
+    CountryTaxBenefitSystem = Microsimulation = None
+
+
+class BaselineCache:
+    """Memoises calc() results and aggregates of a baseline Microsimulation.
+
+    Each (variable, options) array and each (variable, options, aggregation)
+    value is computed once; anything else is passed through to the wrapped
+    simulation, so the cache can stand in for it wherever a baseline is used.
+    """
+
+    def __init__(self, sim: Microsimulation):
+        self.sim = sim
+        self.arrays = {}
+        self.aggregates = {}
+        self.indices = {}
+
+    def __getattr__(self, name):
+        if name == "sim":
+            raise AttributeError(name)
+        return getattr(self.sim, name)
+
+    @staticmethod
+    def _key(variable: str, options: dict) -> tuple:
+        return (variable, tuple(sorted(options.items())))
+
+    def calc(self, variable: str, **options):
+        key = self._key(variable, options)
+        if key not in self.arrays:
+            self.arrays[key] = self.sim.calc(variable, **options)
+        return self.arrays[key]
+
+    def aggregate(self, variable: str, aggregation: str = "sum", **options):
+        key = (*self._key(variable, options), aggregation)
+        if key not in self.aggregates:
+            self.aggregates[key] = getattr(
+                self.calc(variable, **options), aggregation
+            )()
+        return self.aggregates[key]
+
+    def index(
+        self, income_variable: str = "equiv_household_net_income"
+    ) -> "BaselineIndex":
+        # The BaselineIndex of this baseline, built on first use.
+        if income_variable not in self.indices:
+            self.indices[income_variable] = BaselineIndex(
+                self, income_variable
+            )
+        return self.indices[income_variable]
+
+
+def total(sim, variable: str, **options) -> float:
+    if isinstance(sim, BaselineCache):
+        return sim.aggregate(variable, "sum", **options)
+    return sim.calc(variable, **options).sum()
+
+
+AGE_GROUPS = ("Child", "Working-age adult", "Pensioner")
+
+
+@lru_cache(maxsize=1)
+def _variables() -> dict:
+    return CountryTaxBenefitSystem().variables
+
+
+class BaselineIndex:
+    """Person-level groupings of a baseline, for distributional tables.
+
+    Built once per baseline (see BaselineCache.index), it holds each
+    person's weight, income percentile and decile, and an integer code per
+    person for every other grouping (age group, family type and region).
+    Any person-level array is then reduced over all the groupings with a
+    single weighted np.bincount. Everything is read through calc(), so a
+    CachedSimulation baseline is never built.
+    """
+
+    def __init__(
+        self,
+        baseline: BaselineCache,
+        income_variable: str = "equiv_household_net_income",
+    ):
+        income = baseline.calc(income_variable, map_to="person")
+        self.weights = np.array(income.weights)
+        is_adult = np.array(baseline.calc("is_adult"), dtype=bool)
+        is_WA_adult = np.array(baseline.calc("is_WA_adult"), dtype=bool)
+        self.groups = {
+            "decile": (
+                np.array(income.decile_rank()).astype(np.int8) - 1,
+                list(range(1, 11)),
+            ),
+            "percentile": (
+                np.array(income.percentile_rank()).astype(np.int8) - 1,
+                list(range(1, 101)),
+            ),
+            "age_group": (
+                is_adult.astype(np.int8) + (is_adult & ~is_WA_adult),
+                list(AGE_GROUPS),
+            ),
+        }
+        for variable in ("family_type", "region"):
+            self.groups[variable] = self._enum_codes(baseline, variable)
+        # One flat index over every grouping, each offset past the last.
+        sizes = [len(labels) for _, labels in self.groups.values()]
+        self.offsets = dict(zip(self.groups, np.cumsum([0] + sizes[:-1])))
+        self.flat = np.concatenate(
+            [
+                codes.astype(int) + self.offsets[name]
+                for name, (codes, _) in self.groups.items()
+            ]
+        )
+        self.group_weights = self._reduce(self.weights)
+
+    @staticmethod
+    def _enum_codes(baseline, variable: str) -> tuple:
+        # Person-level codes of an Enum variable of any entity, whether calc()
+        # gives its codes or their names. Only numeric ids are mapped to
+        # people.
+        metadata = _variables()[variable]
+        labels = [value.name for value in metadata.possible_values]
+        values = np.array(baseline.calc(variable))
+        if values.dtype.kind not in "iu":
+            values = pd.Categorical(
+                values.astype(str), categories=labels
+            ).codes
+        entity = metadata.entity.key
+        if entity != "person":
+            ids = np.array(baseline.calc(f"{entity}_id"))
+            order = np.argsort(ids)
+            person_ids = np.array(
+                baseline.calc(f"{entity}_id", map_to="person")
+            )
+            values = values[order[np.searchsorted(ids[order], person_ids)]]
+        return values.astype(np.int8), labels
+
+    def _reduce(self, weighted_values: np.ndarray) -> np.ndarray:
+        return np.bincount(
+            self.flat,
+            weights=np.tile(weighted_values, len(self.groups)),
+            minlength=sum(len(labels) for _, labels in self.groups.values()),
+        )
+
+    def _split(self, totals: np.ndarray) -> dict:
+        return {
+            name: totals[self.offsets[name] : self.offsets[name] + len(labels)]
+            for name, (_, labels) in self.groups.items()
+        }
+
+    def breakdown(self, values: np.ndarray) -> pd.DataFrame:
+        """Weighted total and mean of a person-level array in every group.
+
+        Indexed by (grouping, group).
+        """
+        totals = self._reduce(np.asarray(values, dtype=float) * self.weights)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = totals / self.group_weights
+        index = pd.MultiIndex.from_tuples(
+            [
+                (name, label)
+                for name, (_, labels) in self.groups.items()
+                for label in labels
+            ],
+            names=("grouping", "group"),
+        )
+        return pd.DataFrame(
+            {"total": totals, "mean": means, "weight": self.group_weights},
+            index=index,
+        )
+
+    def shares(
+        self,
+        codes: np.ndarray,
+        categories: int,
+        grouping: str = "decile",
+        mask: np.ndarray = None,
+    ) -> np.ndarray:
+        """Weighted share of each group's people in each category.
+
+        Returns a (groups x categories) array. People outside `mask` are
+        left out, and a group with no one left has all-zero shares.
+        """
+        group_codes, labels = self.groups[grouping]
+        weights = self.weights
+        if mask is not None:
+            group_codes, codes, weights = (
+                group_codes[mask],
+                codes[mask],
+                weights[mask],
+            )
+        counts = np.bincount(
+            group_codes.astype(int) * categories + codes,
+            weights=weights,
+            minlength=len(labels) * categories,
+        ).reshape(len(labels), categories)
+        totals = counts.sum(axis=1, keepdims=True)
+        return np.divide(
+            counts, totals, out=np.zeros_like(counts), where=totals > 0
+        )
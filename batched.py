@@ -0,0 +1,118 @@
+from typing import Callable
+import numpy as np
+import pandas as pd
+from microdf import MicroSeries
+from openfisca_uk import Microsimulation
+from openfisca_uk.api import *
+from metrics import METRICS, ImpactReport
+
+
+class TiledDataset:
+    """A dataset holding `copies` stacked copies of another dataset.
+
+    Entity IDs are offset per copy so each copy is a separate set of
+    households, in the same order as the original.
+    """
+
+    def __init__(self, dataset, copies: int):
+        self.dataset = dataset
+        self.copies = copies
+        self.name = f"{getattr(dataset, 'name', 'dataset')}_x{copies}"
+
+    def load(self, year: int = None) -> dict:
+        data = self.dataset.load(year)
+        arrays = {name: np.array(data[name]) for name in data.keys()}
+        id_columns = [name for name in arrays if name.endswith("_id")]
+        offset = max(arrays[name].max() for name in id_columns) + 1
+        tiled = {}
+        for name, array in arrays.items():
+            if name in id_columns:
+                tiled[name] = np.concatenate(
+                    [array + copy * offset for copy in range(self.copies)]
+                )
+            else:
+                tiled[name] = np.tile(array, self.copies)
+        return tiled
+
+
+class ScenarioSlice:
+    # One copy's view of a BatchedSimulation, usable wherever a
+    # Microsimulation's calc() is.
+    def __init__(self, batch, index: int):
+        self.batch = batch
+        self.index = index
+
+    def calc(self, variable: str, **options) -> MicroSeries:
+        values, weights = self.batch.split(variable, **options)
+        return MicroSeries(values[self.index], weights=weights[self.index])
+
+
+class BatchedSimulation:
+    """Simulates a UBI reform at several amounts in one Microsimulation.
+
+    The dataset is tiled once per amount and each copy's UBI is set to its
+    amount, so every formula runs once over the stacked arrays.
+    """
+
+    def __init__(
+        self,
+        base_reforms: tuple,
+        ubi_reform_func: Callable[[float], Reform],
+        amounts: list,
+        dataset=None,
+        year: int = 2020,
+    ):
+        if dataset is None:
+            from openfisca_uk_data import FRS as dataset
+        self.amounts = list(amounts)
+        self.sim = Microsimulation(
+            (base_reforms, ubi_reform_func(1)),
+            dataset=TiledDataset(dataset, len(self.amounts)),
+            year=year,
+        )
+        simulation = self.sim.simulation
+        unit_ubi = simulation.calculate("UBI", year)
+        amount = np.repeat(self.amounts, len(unit_ubi) // len(self.amounts))
+        simulation.get_holder("UBI").delete_arrays()
+        simulation.set_input("UBI", year, unit_ubi * amount)
+        self._split = {}
+
+    def split(self, variable: str, **options) -> tuple:
+        # Values and weights of a variable, one row per amount.
+        key = (variable, tuple(sorted(options.items())))
+        if key not in self._split:
+            result = self.sim.calc(variable, **options)
+            shape = (len(self.amounts), -1)
+            self._split[key] = (
+                np.array(result).reshape(shape),
+                np.array(result.weights).reshape(shape),
+            )
+        return self._split[key]
+
+    def scenario(self, index: int) -> ScenarioSlice:
+        return ScenarioSlice(self, index)
+
+
+def simulate_ubi_levels(
+    base_reforms: tuple,
+    ubi_reform_func: Callable[[float], Reform],
+    amounts: list,
+    baseline,
+    metrics: tuple = METRICS,
+    dataset=None,
+    year: int = 2020,
+) -> pd.DataFrame:
+    """Impact metrics of a UBI reform at each of `amounts`, from one batched
+    simulation. Returns one row per amount."""
+    batch = BatchedSimulation(
+        base_reforms, ubi_reform_func, amounts, dataset=dataset, year=year
+    )
+    return pd.DataFrame(
+        [
+            ImpactReport.compute(
+                baseline, batch.scenario(index), metrics=metrics
+            ).to_series()
+            for index in range(len(batch.amounts))
+        ],
+        index=pd.Index(batch.amounts, name="amount"),
+    )
@@ -0,0 +1,168 @@
+"""Times each stage of the reform_df scenario grid and writes the results
+as JSON, so runs can be compared between commits.
+
+    python -m benchmarks.run [--dataset frs|synthetic] [--persons N]
+        [--output FILE]
+    python -m benchmarks.run --compare OLD.json NEW.json
+"""
+import argparse
+import json
+import resource
+import subprocess
+import time
+from functools import partial
+from pathlib import Path
+from openfisca_uk import Microsimulation
+import pandas as pd
+from baseline import BaselineCache
+from charts import intra_decile_graph_data
+from metrics import ImpactReport
+from scenarios import CountingSimulation, create_reform
+from synthetic import SyntheticFRS
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+SCENARIOS = pd.DataFrame(
+    {
+        "Adult PA (£/year)": [2500, 0, 2500, 2500, 2500, 0],
+        "Pensioner PA (£/year)": [12500, 12500, 2500, 12500, 12500, 0],
+        "NI Primary Threshold (£/week)": [50, 0, 50, 50, 50, 0],
+        "UBI for children": [False, False, False, True, False, True],
+        "UBI for pensioners": [False, False, True, False, False, True],
+        "UBI in means tests": [True, True, True, True, False, False],
+    },
+    index=[
+        "Baseline",
+        "Full PA/PT elimination",
+        "Include pensioners",
+        "Include children",
+        "Exclude from means tests",
+        "All",
+    ],
+)
+
+DATASETS = ("frs", "synthetic")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(stages: dict, name: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    stages[name] = time.perf_counter() - start
+    return result
+
+
+def run(dataset: str = "frs", year: int = 2020, persons: int = 10_000) -> dict:
+    if dataset == "synthetic":
+        factory = partial(Microsimulation, dataset=SyntheticFRS(persons))
+    else:
+        factory = Microsimulation
+    baseline_stages = {}
+    baseline = timed(
+        baseline_stages, "baseline", lambda: BaselineCache(factory(year=year))
+    )
+    scenarios = []
+    for name, params in SCENARIOS.iterrows():
+        simulation = CountingSimulation(factory)
+        stages = {}
+        reform = timed(
+            stages,
+            "create_reform",
+            create_reform,
+            params,
+            baseline,
+            year=year,
+            simulation=simulation,
+        )
+        reform_sim = timed(
+            stages, "reform_simulation", simulation, reform, year=year
+        )
+        timed(stages, "metrics", ImpactReport.compute, baseline, reform_sim)
+        timed(
+            stages,
+            "intra_decile_graph_data",
+            intra_decile_graph_data,
+            baseline,
+            reform_sim,
+            amounts=[name],
+        )
+        scenarios += [
+            {
+                "name": name,
+                "seconds": stages,
+                "simulations": simulation.built,
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        ]
+    return {
+        "commit": subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip(),
+        "dataset": dataset,
+        "persons": persons if dataset == "synthetic" else None,
+        "year": year,
+        "baseline_seconds": baseline_stages["baseline"],
+        "scenarios": scenarios,
+        "total_seconds": sum(
+            sum(scenario["seconds"].values()) for scenario in scenarios
+        ),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(old: dict, new: dict) -> pd.DataFrame:
+    def stage_times(results):
+        return pd.DataFrame(
+            {
+                scenario["name"]: {
+                    **scenario["seconds"],
+                    "simulations": scenario["simulations"],
+                }
+                for scenario in results["scenarios"]
+            }
+        ).T
+
+    old_times, new_times = stage_times(old), stage_times(new)
+    return pd.concat(
+        {
+            old["commit"]: old_times,
+            new["commit"]: new_times,
+            "ratio": new_times / old_times,
+        },
+        axis=1,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", choices=DATASETS, default="frs")
+    parser.add_argument("--year", type=int, default=2020)
+    parser.add_argument(
+        "--persons",
+        type=int,
+        default=10_000,
+        help="Size of the synthetic dataset.",
+    )
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", nargs=2, type=Path)
+    args = parser.parse_args()
+    if args.compare:
+        old, new = (json.loads(path.read_text()) for path in args.compare)
+        print(compare(old, new).round(3).to_string())
+    else:
+        results = run(args.dataset, args.year, args.persons)
+        name = args.dataset
+        if args.dataset == "synthetic":
+            name += f"-{args.persons}"
+        output = args.output or (
+            RESULTS_DIR / f"{results['commit']}-{name}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+        print(f"Wrote {output}")
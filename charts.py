@@ -1,6 +1,7 @@
-
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
+from baseline import BaselineCache, BaselineIndex
 NAMES = (
         "Gain more than 5%",
         "Gain less than 5%",
@@ -8,25 +9,39 @@ NAMES = (
         "Lose less than 5%",
         "Lose more than 5%"
     )
+# Relative gain thresholds between the NAMES bands, in ascending order.
+BAND_EDGES = (-0.05, -1e-3, 1e-3, 0.05)
 
-def intra_decile_graph_data(baseline, *reform_sims):
-    AMOUNTS = [45, 60, 75, 90]
+def intra_decile_graph_data(baseline, *reform_sims, amounts=(45, 60, 75, 90), index=None):
+    # `index` is a BaselineIndex of baseline; by default the one a
+    # BaselineCache keeps, or else one built here.
+    if len(amounts) < len(reform_sims):
+        raise ValueError("Each reform simulation needs an amount label.")
+    if index is None and isinstance(baseline, BaselineCache):
+        index = baseline.index()
+    elif index is None:
+        index = BaselineIndex(baseline)
+    baseline_income = np.array(baseline.calc("household_net_income", map_to="person"))
     l = []
-    for i, reform_sim in enumerate(reform_sims):
-        income = baseline.calc("equiv_household_net_income", map_to="person")
-        decile = income.decile_rank()
-        gain = reform_sim.calc("household_net_income", map_to="person") - baseline.calc("household_net_income", map_to="person")
-        rel_gain = (gain / baseline.calc("household_net_income", map_to="person")).dropna()
-        bands = (None, 0.05, 1e-3, -1e-3, -0.05, None)
-        for upper, lower, name in zip(bands[:-1], bands[1:], NAMES):
-            fractions = []
-            for j in range(1, 11):
-                subset = rel_gain[decile == j]
-                if lower is not None:
-                    subset = subset[rel_gain > lower]
-                if upper is not None:
-                    subset = subset[rel_gain <= upper]
-                fractions += [subset.count() / rel_gain[decile == j].count()]
-            tmp = pd.DataFrame({"UBI": f"£{AMOUNTS[i]}/week", "fraction": fractions, "decile": list(range(1, 11)), "Outcome": name})
-            l.append(tmp)
-    return pd.concat(l).reset_index()
\ No newline at end of file
+    for amount, reform_sim in zip(amounts, reform_sims):
+        gain = np.array(reform_sim.calc("household_net_income", map_to="person")) - baseline_income
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_gain = gain / baseline_income
+        valid = ~np.isnan(rel_gain)
+        # np.digitize numbers the bands from the largest loss upwards.
+        outcome = np.zeros(len(rel_gain), dtype=int)
+        outcome[valid] = len(NAMES) - 1 - np.digitize(rel_gain[valid], BAND_EDGES, right=True)
+        # (decile x outcome) shares, flattened outcome by outcome.
+        fractions = index.shares(outcome, len(NAMES), "decile", mask=valid).T.ravel()
+        label = amount if isinstance(amount, str) else f"£{amount}/week"
+        tmp = pd.DataFrame(
+            {
+                "UBI": label,
+                "fraction": fractions,
+                "decile": np.tile(np.arange(1, 11), len(NAMES)),
+                "Outcome": np.repeat(NAMES, 10),
+            },
+            index=np.tile(np.arange(10), len(NAMES)),
+        )
+        l.append(tmp)
+    return pd.concat(l).reset_index()
@@ -0,0 +1,121 @@
+import enum
+import numpy as np
+import pytest
+from synthetic import SyntheticFRS
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    # Small enough for full simulations to take seconds.
+    return SyntheticFRS(persons=2_000)
+
+
+class ToySimulation:
+    """A hand-built baseline for tests that need no tax-benefit model.
+
+    `arrays` maps each variable to its (entity, values); calc() maps
+    benefit unit and household values to people through the id columns,
+    with every row weighted by its household's weight.
+    """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+
+    def calc(self, variable: str, map_to: str = None, **options):
+        from microdf import MicroSeries
+
+        entity, values = self.arrays[variable]
+        values = np.asarray(values)
+        household = self._rows("household", entity)
+        if map_to == "person" and entity != "person":
+            values = values[self._rows(entity, "person")]
+            household = self._rows("household", "person")
+        weights = np.asarray(self.arrays["household_weight"][1])[household]
+        return MicroSeries(values, weights=weights)
+
+    def _rows(self, entity: str, of: str) -> np.ndarray:
+        # The row in `entity` of each row of `of`.
+        if entity == of:
+            return np.arange(len(self.arrays[f"{of}_id"][1]))
+        ids = np.asarray(self.arrays[f"{entity}_id"][1])
+        if of == "person":
+            members = np.asarray(self.arrays[f"person_{entity}_id"][1])
+        else:
+            members = np.asarray(self.arrays[f"{of}_{entity}_id"][1])
+        order = np.argsort(ids)
+        return order[np.searchsorted(ids[order], members)]
+
+
+@pytest.fixture
+def toy_arrays():
+    # 300 people in 120 benefit units in 80 households, with shuffled ids.
+    rng = np.random.default_rng(0)
+    benunit_household = rng.permutation(np.arange(120) % 80)
+    person_benunit = rng.permutation(np.arange(300) % 120)
+    benunit_ids = rng.permutation(120) + 1000
+    household_ids = rng.permutation(80) + 5000
+    age = rng.integers(0, 90, 300)
+    income = rng.lognormal(10, 1, 80)
+    return {
+        "person_id": ("person", np.arange(300)),
+        "benunit_id": ("benunit", benunit_ids),
+        "household_id": ("household", household_ids),
+        "person_benunit_id": ("person", benunit_ids[person_benunit]),
+        "person_household_id": (
+            "person",
+            household_ids[benunit_household[person_benunit]],
+        ),
+        "benunit_household_id": (
+            "benunit",
+            household_ids[benunit_household],
+        ),
+        "household_weight": ("household", rng.uniform(100, 1000, 80)),
+        "is_adult": ("person", age >= 18),
+        "is_WA_adult": ("person", (age >= 18) & (age < 66)),
+        "equiv_household_net_income": ("household", income),
+        "household_net_income": ("household", income * 1.5),
+        "family_type": (
+            "benunit",
+            rng.choice(["SINGLE", "COUPLE", "LONE_PARENT"], 120),
+        ),
+        "region": ("household", rng.integers(0, 4, 80)),
+        "in_poverty_bhc": ("person", rng.random(300) < 0.2),
+        "in_deep_poverty_bhc": ("person", rng.random(300) < 0.1),
+        "net_income": ("benunit", rng.lognormal(10, 1, 120)),
+    }
+
+
+class FamilyType(enum.Enum):
+    SINGLE = "Single"
+    COUPLE = "Couple"
+    LONE_PARENT = "Lone parent"
+
+
+class Region(enum.Enum):
+    NORTH = "North"
+    MIDLANDS = "Midlands"
+    LONDON = "London"
+    SOUTH = "South"
+
+
+class ToyVariable:
+    def __init__(self, entity: str, possible_values):
+        self.entity = type("Entity", (), {"key": entity})
+        self.possible_values = possible_values
+
+
+@pytest.fixture
+def toy_baseline(toy_arrays, monkeypatch):
+    # A BaselineCache of toy_arrays, with the variable metadata it is read
+    # with supplied here rather than by openfisca-uk.
+    import baseline
+    import uncertainty
+
+    variables = {
+        "family_type": ToyVariable("benunit", FamilyType),
+        "region": ToyVariable("household", Region),
+        "net_income": ToyVariable("benunit", None),
+    }
+    for module in (baseline, uncertainty):
+        monkeypatch.setattr(module, "_variables", lambda: variables)
+    return baseline.BaselineCache(ToySimulation(toy_arrays))
@@ -0,0 +1,178 @@
+from collections import defaultdict
+from typing import Callable
+import numpy as np
+from openfisca_uk import Microsimulation
+from openfisca_uk.api import *
+
+MEANS_TEST_VARIABLES = {
+    "universal_credit_income_reduction",
+    "tax_credits_applicable_income",
+    "housing_benefit_applicable_income",
+    "income_support_applicable_income",
+}
+
+TARGET_VARIABLES = (
+    "net_income",
+    "household_net_income",
+    "equiv_household_net_income",
+    "in_poverty_bhc",
+    "in_deep_poverty_bhc",
+    "poverty_gap_bhc",
+)
+
+
+def dependency_graph(tracer) -> dict:
+    # Maps each traced variable to the variables its formulas read. Variables
+    # are merged across periods, and a node served from the cache has no
+    # children, so every node of the trace is visited.
+    graph = defaultdict(set)
+    stack = list(tracer.trees)
+    while stack:
+        node = stack.pop()
+        for child in node.children:
+            graph[node.name].add(child.name)
+            stack.append(child)
+    return graph
+
+
+def dependents(graph: dict, variable: str) -> set:
+    readers = defaultdict(set)
+    for name, inputs in graph.items():
+        for input_name in inputs:
+            readers[input_name].add(name)
+    found = set()
+    stack = [variable]
+    while stack:
+        for name in readers[stack.pop()]:
+            if name not in found:
+                found.add(name)
+                stack.append(name)
+    return found
+
+
+def _microsimulation(sim) -> Microsimulation:
+    # The Microsimulation behind a CachedSimulation, whose stored results
+    # would bypass the trace.
+    return getattr(sim, "sim", sim)
+
+
+class IncrementalUBI:
+    """Re-evaluates a UBI reform at new amounts from one simulation.
+
+    The funding reforms (plus any extra reforms, such as
+    include_UBI_in_means_tests) are simulated once with a £1/year UBI,
+    tracing which variables depend on UBI. Moving to another amount sets UBI
+    to a multiple of that per-person array and drops only its dependents,
+    along with anything computed later that the trace did not cover, so the
+    rest of the simulation is reused. Simulations are built with
+    `simulation`, which takes the same arguments as Microsimulation.
+    """
+
+    def __init__(
+        self,
+        funding_reforms: tuple,
+        ubi_reform_func: Callable[[float], Reform],
+        extra_reforms: tuple = (),
+        year: int = 2020,
+        targets: tuple = TARGET_VARIABLES,
+        dataset=None,
+        simulation: type = Microsimulation,
+    ):
+        self.funding_reforms = funding_reforms
+        self.ubi_reform_func = ubi_reform_func
+        self.extra_reforms = extra_reforms
+        self.year = year
+        self.targets = targets
+        self.options = {} if dataset is None else {"dataset": dataset}
+        self.simulation = simulation
+        self.sim = _microsimulation(
+            simulation(
+                (funding_reforms, ubi_reform_func(1), extra_reforms),
+                year=year,
+                **self.options,
+            )
+        )
+        simulation = self.sim.simulation
+        simulation.trace = True
+        for variable in targets:
+            self.sim.calc(variable)
+        graph = dependency_graph(simulation.tracer)
+        simulation.trace = False
+        self.traced = set(graph) | set.union(set(), *graph.values())
+        self.downstream = dependents(graph, "UBI")
+        self.unit_ubi = simulation.calculate("UBI", year)
+        self.amount = 1
+
+    def _stale_variables(self) -> set:
+        # Formula variables computed after the trace may read UBI unseen, so
+        # they are dropped too; inputs never are.
+        simulation = self.sim.simulation
+        untraced = {
+            name
+            for name, variable in simulation.tax_benefit_system.variables.items()
+            if name not in self.traced
+            and variable.formulas
+            and simulation.get_holder(name).get_known_periods()
+        }
+        return self.downstream | untraced | {"UBI"}
+
+    def at(self, amount: float) -> Microsimulation:
+        if amount != self.amount:
+            simulation = self.sim.simulation
+            for variable in self._stale_variables():
+                simulation.get_holder(variable).delete_arrays()
+            simulation.set_input("UBI", self.year, self.unit_ubi * amount)
+            self.amount = amount
+        return self.sim
+
+    def validate(self, amount: float) -> float:
+        # Largest absolute difference from a full simulation at `amount`
+        # across the target variables.
+        full_sim = self.simulation(
+            (
+                self.funding_reforms,
+                self.ubi_reform_func(amount),
+                self.extra_reforms,
+            ),
+            year=self.year,
+            **self.options,
+        )
+        sim = self.at(amount)
+        return max(
+            np.abs(
+                np.array(sim.calc(variable, weighted=False))
+                - np.array(full_sim.calc(variable, weighted=False))
+            ).max()
+            for variable in self.targets
+        )
+
+
+class UBISweep(IncrementalUBI):
+    """An IncrementalUBI for a UBI outside means tests.
+
+    Here the UBI only reaches net income through gross_income, so moving to
+    another amount never recomputes income tax or benefits.
+    """
+
+    def __init__(
+        self,
+        funding_reforms: tuple,
+        ubi_reform_func: Callable[[float], Reform],
+        year: int = 2020,
+        targets: tuple = TARGET_VARIABLES,
+        dataset=None,
+        simulation: type = Microsimulation,
+    ):
+        super().__init__(
+            funding_reforms,
+            ubi_reform_func,
+            year=year,
+            targets=targets,
+            dataset=dataset,
+            simulation=simulation,
+        )
+        if self.downstream & MEANS_TEST_VARIABLES:
+            raise ValueError(
+                "The UBI enters a means test, so net income is not additive "
+                "in the UBI amount."
+            )
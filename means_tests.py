@@ -0,0 +1,260 @@
+import numpy as np
+from openfisca_uk.api import *
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+if numba is not None:
+
+    @numba.njit(cache=True)
+    def _segment_sum_kernel(values, segments, out):
+        for row in range(values.shape[0]):
+            for column in range(values.shape[1]):
+                out[segments[row], column] += values[row, column]
+
+
+def segment_sum(
+    values: np.ndarray, segments: np.ndarray, count: int
+) -> np.ndarray:
+    # Column totals of a (rows x columns) matrix within each of `count`
+    # segments, in one pass.
+    columns = values.shape[1]
+    if numba is not None:
+        out = np.zeros((count, columns))
+        _segment_sum_kernel(values, segments, out)
+        return out
+    index = (segments[:, None] * columns + np.arange(columns)).ravel()
+    return np.bincount(
+        index, weights=values.ravel(), minlength=count * columns
+    ).reshape(count, columns)
+
+
+def gather(benunit, period, inputs: dict) -> dict:
+    """Benefit unit totals of person variables, from one matrix.
+
+    `inputs` maps each variable to its period options, as they would be
+    passed to aggr(). Each variable is read into a column of one matrix,
+    which is summed over benefit unit membership once.
+    """
+    members = benunit.members
+    values = np.empty((members.count, len(inputs)))
+    for column, (variable, options) in enumerate(inputs.items()):
+        values[:, column] = members(variable, period, options=options)
+    totals = segment_sum(values, benunit.members_entity_id, benunit.count)
+    return {
+        variable: totals[:, column] for column, variable in enumerate(inputs)
+    }
+
+
+def total(sums: dict, variables: list) -> np.ndarray:
+    # Adds benefit unit totals in list order, as aggr() does.
+    result = sums[variables[0]].copy()
+    for variable in variables[1:]:
+        result += sums[variable]
+    return result
+
+
+class universal_credit_income_reduction(Variable):
+    value_type = float
+    entity = BenUnit
+    label = "Reduction from income for Universal Credit"
+    definition_period = MONTH
+
+    INPUTS = {
+        "employment_income": [DIVIDE],
+        "trading_income": [DIVIDE],
+        "UBI": [DIVIDE],
+        "carers_allowance": [ADD],
+        "JSA_contrib": [ADD],
+        "state_pension": [ADD],
+        "pension_income": [DIVIDE],
+        "income_tax": [DIVIDE],
+        "national_insurance": [DIVIDE],
+    }
+
+    def formula(benunit, period, parameters):
+        UC = parameters(period).benefit.universal_credit
+        sums = gather(
+            benunit, period, universal_credit_income_reduction.INPUTS
+        )
+        earned_income = total(
+            sums, ["employment_income", "trading_income", "UBI"]
+        )
+        unearned_income = total(
+            sums, ["carers_allowance", "JSA_contrib", "state_pension"]
+        )
+        unearned_income += sums["pension_income"]
+        earned_income -= total(sums, ["income_tax", "national_insurance"])
+        np.maximum(earned_income, 0, out=earned_income)
+        housing_element = benunit("UC_eligible_rent", period)
+        earnings_disregard = np.where(
+            housing_element > 0,
+            UC.means_test.earn_disregard_with_housing,
+            UC.means_test.earn_disregard,
+        )
+        earned_income -= earnings_disregard
+        np.maximum(earned_income, 0, out=earned_income)
+        earned_income *= UC.means_test.reduction_rate
+        earned_income += unearned_income
+        return np.maximum(earned_income, 0, out=earned_income)
+
+
+class tax_credits_applicable_income(Variable):
+    value_type = float
+    entity = BenUnit
+    label = "Applicable income for Tax Credits"
+    definition_period = YEAR
+    reference = "The Tax Credits (Definition and Calculation of Income) Regulations 2002 s. 3"
+
+    STEP_1_COMPONENTS = [
+        "taxable_pension_income",
+        "taxable_savings_interest_income",
+        "taxable_dividend_income",
+        "taxable_property_income",
+        "UBI",
+    ]
+    STEP_2_COMPONENTS = [
+        "taxable_employment_income",
+        "taxable_trading_income",
+        "taxable_social_security_income",
+        "taxable_miscellaneous_income",
+    ]
+
+    def formula(benunit, period, parameters):
+        TC = parameters(period).benefit.tax_credits
+        variables = tax_credits_applicable_income
+        sums = gather(
+            benunit,
+            period,
+            {
+                variable: None
+                for variable in variables.STEP_1_COMPONENTS
+                + variables.STEP_2_COMPONENTS
+            },
+        )
+        income = total(sums, variables.STEP_1_COMPONENTS)
+        income = amount_over(income, TC.means_test.non_earned_disregard)
+        income += total(sums, variables.STEP_2_COMPONENTS)
+        EXEMPT_BENEFITS = ["income_support", "ESA_income", "JSA_income"]
+        on_exempt_benefits = (
+            add(benunit, period, EXEMPT_BENEFITS, options=[ADD]) > 0
+        )
+        income[on_exempt_benefits] = 0
+        return income
+
+
+# Person inputs to the two weekly means tests, read in one gather.
+WEEKLY_INPUTS = {
+    "employment_income": [DIVIDE],
+    "trading_income": [DIVIDE],
+    "property_income": [DIVIDE],
+    "pension_income": [DIVIDE],
+    "UBI": [DIVIDE],
+    "income_tax": [DIVIDE],
+    "national_insurance": [DIVIDE],
+    "personal_benefits": None,
+    "pension_contributions": [DIVIDE],
+}
+WEEKLY_INCOME = [
+    "employment_income",
+    "trading_income",
+    "property_income",
+    "pension_income",
+    "UBI",
+]
+
+
+class weekly_means_test_income(Variable):
+    value_type = float
+    entity = BenUnit
+    label = "Income counted by both the Housing Benefit and Income Support means tests"
+    definition_period = WEEK
+
+    def formula(benunit, period, parameters):
+        # A variable, so the simulation computes the gather once per week
+        # for both means tests, and drops it with them when UBI changes.
+        sums = gather(benunit, period, WEEKLY_INPUTS)
+        income = total(sums, WEEKLY_INCOME)
+        income += sums["personal_benefits"]
+        income -= total(sums, ["income_tax", "national_insurance"])
+        income -= sums["pension_contributions"] * 0.5
+        return income
+
+
+class housing_benefit_applicable_income(Variable):
+    value_type = float
+    entity = BenUnit
+    label = "Relevant income for Housing Benefit means test"
+    definition_period = WEEK
+
+    def formula(benunit, period, parameters):
+        WTC = parameters(period).benefit.tax_credits.working_tax_credit
+        means_test = parameters(period).benefit.housing_benefit.means_test
+        sums = gather(
+            benunit, period, {"childcare_cost": [ADD], "hours_worked": None}
+        )
+        income = benunit("weekly_means_test_income", period) + add(
+            benunit, period, ["tax_credits"], options=[DIVIDE]
+        )
+        income += add(
+            benunit,
+            period,
+            ["child_benefit", "income_support", "JSA_income", "ESA_income"],
+        )
+        num_children = benunit.nb_persons(BenUnit.CHILD)
+        max_childcare_amount = (
+            num_children == 1
+        ) * WTC.elements.childcare_1 + (
+            num_children > 1
+        ) * WTC.elements.childcare_2
+        hours = sums["hours_worked"]
+        is_lone_parent = benunit("is_lone_parent", period)
+        income -= benunit("is_single_person", period) * (
+            means_test.income_disregard_single
+        )
+        income -= benunit("is_couple", period) * (
+            means_test.income_disregard_couple
+        )
+        income -= is_lone_parent * means_test.income_disregard_lone_parent
+        income -= (
+            (hours > means_test.worker_hours)
+            + (is_lone_parent * hours > WTC.min_hours.lower)
+        ) * means_test.worker_income_disregard
+        income -= np.minimum(max_childcare_amount, sums["childcare_cost"])
+        return np.maximum(income, 0, out=income)
+
+
+class income_support_applicable_income(Variable):
+    value_type = float
+    entity = BenUnit
+    label = "Relevant income for Income Support means test"
+    definition_period = WEEK
+
+    def formula(benunit, period, parameters):
+        IS = parameters(period).benefit.income_support
+        income = benunit("weekly_means_test_income", period) + add(
+            benunit, period, ["child_benefit"]
+        )
+        family_type = benunit("family_type")
+        families = family_type.possible_values
+        income -= (family_type == families.SINGLE) * (
+            IS.means_test.income_disregard_single
+        )
+        income -= benunit("is_couple") * IS.means_test.income_disregard_couple
+        income -= (family_type == families.LONE_PARENT) * (
+            IS.means_test.income_disregard_lone_parent
+        )
+        return np.maximum(income, 0, out=income)
+
+
+# Added by the fused reform, alongside the FUSED_VARIABLES that read it.
+SHARED_VARIABLES = (weekly_means_test_income,)
+FUSED_VARIABLES = (
+    universal_credit_income_reduction,
+    tax_credits_applicable_income,
+    housing_benefit_applicable_income,
+    income_support_applicable_income,
+)
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+from baseline import BaselineCache
+
+# Metric name -> (variable, entity to map to, MicroSeries aggregation).
+LEVEL_METRICS = {
+    "poverty": ("in_poverty_bhc", "person", "mean"),
+    "deep_poverty": ("in_deep_poverty_bhc", "person", "mean"),
+    "poverty_gap": ("poverty_gap_bhc", None, "sum"),
+    "gini": ("household_net_income", "person", "gini"),
+    "median": ("household_net_income", "person", "median"),
+    "net_income": ("net_income", None, "sum"),
+}
+
+METRICS = (
+    "poverty",
+    "deep_poverty",
+    "poverty_gap",
+    "gini",
+    "median",
+    "winners",
+    "losers",
+    "net_cost",
+    "decile_shares",
+)
+
+
+def _options(map_to: str) -> dict:
+    return {} if map_to is None else {"map_to": map_to}
+
+
+def _aggregate(sim, variable: str, map_to: str, aggregation: str) -> float:
+    if isinstance(sim, BaselineCache):
+        return sim.aggregate(variable, aggregation, **_options(map_to))
+    return getattr(sim.calc(variable, **_options(map_to)), aggregation)()
+
+
+def decile_shares(income, decile: np.ndarray) -> np.ndarray:
+    # Each income decile's share of total (weighted) income.
+    totals = np.bincount(
+        decile,
+        weights=np.array(income) * np.array(income.weights),
+        minlength=11,
+    )[1:11]
+    return totals / totals.sum()
+
+
+class ImpactReport:
+    """Baseline and reform levels of the headline impact metrics.
+
+    compute() reads each variable once per simulation and derives every
+    requested metric from those arrays.
+    """
+
+    def __init__(
+        self,
+        baseline: dict,
+        reform: dict,
+        winners: float = None,
+        losers: float = None,
+        decile_shares: pd.DataFrame = None,
+    ):
+        self.baseline = baseline
+        self.reform = reform
+        self.winners = winners
+        self.losers = losers
+        self.decile_shares = decile_shares
+
+    @classmethod
+    def compute(cls, baseline, reform_sim, metrics: tuple = METRICS):
+        reform_arrays = {}
+
+        def reform_calc(variable, map_to):
+            key = (variable, map_to)
+            if key not in reform_arrays:
+                reform_arrays[key] = reform_sim.calc(
+                    variable, **_options(map_to)
+                )
+            return reform_arrays[key]
+
+        levels = [metric for metric in LEVEL_METRICS if metric in metrics]
+        if "net_cost" in metrics:
+            levels += ["net_income"]
+        baseline_levels = {}
+        reform_levels = {}
+        for metric in levels:
+            variable, map_to, aggregation = LEVEL_METRICS[metric]
+            baseline_levels[metric] = _aggregate(
+                baseline, variable, map_to, aggregation
+            )
+            reform_levels[metric] = getattr(
+                reform_calc(variable, map_to), aggregation
+            )()
+        report = cls(baseline_levels, reform_levels)
+        if {"winners", "losers", "decile_shares"} & set(metrics):
+            income = reform_calc("household_net_income", "person")
+            baseline_income = baseline.calc(
+                "household_net_income", map_to="person"
+            )
+            report.winners = (income > baseline_income + 1).mean()
+            report.losers = (income < baseline_income - 1).mean()
+        if "decile_shares" in metrics:
+            decile = baseline.calc(
+                "equiv_household_net_income", map_to="person"
+            ).decile_rank()
+            decile = np.array(decile).astype(int)
+            report.decile_shares = pd.DataFrame(
+                {
+                    "baseline": decile_shares(baseline_income, decile),
+                    "reform": decile_shares(income, decile),
+                },
+                index=pd.RangeIndex(1, 11, name="decile"),
+            )
+        return report
+
+    def change(self, metric: str) -> float:
+        return (self.reform[metric] - self.baseline[metric]) / self.baseline[
+            metric
+        ]
+
+    @property
+    def net_cost(self) -> float:
+        return self.reform["net_income"] - self.baseline["net_income"]
+
+    def to_series(self) -> pd.Series:
+        record = {}
+        for metric in self.reform:
+            if metric == "net_income":
+                record["net_cost"] = self.net_cost
+                continue
+            record[metric] = self.reform[metric]
+            record[f"{metric}_change"] = self.change(metric)
+        if self.winners is not None:
+            record["winners"] = self.winners
+            record["losers"] = self.losers
+        if self.decile_shares is not None:
+            for decile, share in self.decile_shares.reform.items():
+                record[f"decile_{decile}_share"] = share
+        return pd.Series(record)
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from microdf import MicroSeries
+from openfisca_uk import Microsimulation
+from batched import TiledDataset
+
+DELTA = 100  # £/year of extra earnings
+MAX_RANK = 4  # people per household given a marginal rate
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def household_rank(household_id: np.ndarray) -> np.ndarray:
+    # Each person's position (from 0) among the people of their household.
+    order = np.argsort(household_id, kind="stable")
+    ordered = household_id[order]
+    position = np.arange(len(ordered))
+    starts = np.concatenate([[True], ordered[1:] != ordered[:-1]])
+    first = np.maximum.accumulate(np.where(starts, position, 0))
+    rank = np.empty(len(ordered), dtype=int)
+    rank[order] = position - first
+    return rank
+
+
+class PerturbedDataset:
+    """A dataset followed by `max_rank` copies with raised earnings.
+
+    In copy n (from 1) the n-th person of each household earns `delta`
+    more, so one simulation holds every person's perturbed household
+    alongside the original.
+    """
+
+    def __init__(
+        self,
+        dataset,
+        delta: float = DELTA,
+        max_rank: int = MAX_RANK,
+        variable: str = "employment_income",
+    ):
+        self.dataset = dataset
+        self.delta = delta
+        self.max_rank = max_rank
+        self.variable = variable
+        self.name = (
+            f"{getattr(dataset, 'name', 'dataset')}_{variable}"
+            f"+{delta}x{max_rank}"
+        )
+
+    def load(self, year: int = None) -> dict:
+        data = TiledDataset(self.dataset, self.max_rank + 1).load(year)
+        people = len(data["person_household_id"]) // (self.max_rank + 1)
+        rank = household_rank(data["person_household_id"][:people])
+        earnings = data[self.variable].astype(float)
+        for copy in range(1, self.max_rank + 1):
+            block = earnings[copy * people : (copy + 1) * people]
+            block[rank == copy - 1] += self.delta
+        data[self.variable] = earnings
+        return data
+
+
+def marginal_tax_rates(
+    *reforms,
+    dataset=None,
+    year: int = 2020,
+    delta: float = DELTA,
+    max_rank: int = MAX_RANK,
+) -> pd.DataFrame:
+    """Person-level effective marginal tax rates under a policy.
+
+    The rate is the share of `delta` extra earnings not kept in household
+    net income, from one simulation of the perturbed dataset. People past
+    the first `max_rank` of their household get NaN. Returns each person's
+    rate, weight and equivalised household net income decile.
+    """
+    if dataset is None:
+        from openfisca_uk_data import FRS as dataset
+    sim = Microsimulation(
+        *reforms,
+        dataset=PerturbedDataset(dataset, delta, max_rank),
+        year=year,
+    )
+    shape = (max_rank + 1, -1)
+    income = sim.calc("household_net_income", map_to="person")
+    net = np.array(income).reshape(shape)
+    weight = np.array(income.weights).reshape(shape)[0]
+    rank = household_rank(
+        np.array(sim.calc("household_id", map_to="person")).reshape(shape)[0]
+    )
+    perturbed = rank < max_rank
+    person = np.arange(net.shape[1])
+    gain = np.full(net.shape[1], np.nan)
+    gain[perturbed] = (
+        net[rank[perturbed] + 1, person[perturbed]] - net[0, perturbed]
+    )
+    equiv_income = np.array(
+        sim.calc("equiv_household_net_income", map_to="person")
+    ).reshape(shape)[0]
+    decile = MicroSeries(equiv_income, weights=weight).decile_rank()
+    return pd.DataFrame(
+        {
+            "mtr": 1 - gain / delta,
+            "weight": weight,
+            "decile": np.array(decile).astype(int),
+        }
+    )
+
+
+def mtr_distribution(
+    rates: pd.DataFrame, quantiles: tuple = QUANTILES
+) -> pd.DataFrame:
+    # Weighted mean and quantiles of the rates within each decile.
+    rates = rates[rates.mtr.notna()]
+    rows = {}
+    for decile, group in rates.groupby("decile"):
+        mtr = MicroSeries(group.mtr.values, weights=group.weight.values)
+        rows[decile] = {"mean": mtr.mean()}
+        for q in quantiles:
+            rows[decile][f"p{int(q * 100)}"] = mtr.quantile(q)
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("decile")
+
+
+def mtr_comparison(
+    reform: tuple,
+    dataset=None,
+    year: int = 2020,
+    baseline_rates: pd.DataFrame = None,
+    quantiles: tuple = QUANTILES,
+) -> pd.DataFrame:
+    """Decile MTR distributions under the baseline and a reform.
+
+    People are placed in their baseline decile under both. Pass
+    `baseline_rates` (from marginal_tax_rates()) to reuse them across
+    reforms, e.g. for every row of a scenario grid.
+    """
+    if baseline_rates is None:
+        baseline_rates = marginal_tax_rates(dataset=dataset, year=year)
+    reform_rates = marginal_tax_rates(reform, dataset=dataset, year=year)
+    reform_rates["decile"] = baseline_rates.decile
+    return pd.concat(
+        {
+            "baseline": mtr_distribution(baseline_rates, quantiles),
+            "reform": mtr_distribution(reform_rates, quantiles),
+        },
+        axis=1,
+    )
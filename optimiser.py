@@ -0,0 +1,231 @@
+import math
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from baseline import BaselineCache
+from reform import (
+    WA_adult_UBI,
+    adult_UBI,
+    all_UBI,
+    non_pensioner_UBI,
+    ubi_reform,
+)
+from scenarios import CountingSimulation, evaluate_scenario
+from simulation_cache import CachedSimulation
+
+# UBI design -> (reform function, variables summing to its population).
+DESIGNS = {
+    "WA_adult_UBI": (WA_adult_UBI, ("is_WA_adult",)),
+    "non_pensioner_UBI": (non_pensioner_UBI, ("is_child", "is_WA_adult")),
+    "adult_UBI": (adult_UBI, ("is_adult",)),
+    "all_UBI": (all_UBI, ("people",)),
+    "child_WA_adult_UBI": (None, ("is_child", "is_WA_adult")),
+}
+
+# Lever -> (upper bound, rounding), so nearby candidates share cached
+# simulations.
+LEVERS = {
+    "Pensioner PA (£/year)": (12500, 100),
+    "Adult PA (£/year)": (12500, 100),
+    "NI Primary Threshold (£/week)": (183, 1),
+}
+
+
+def child_split_UBI(split: float, baseline: BaselineCache) -> tuple:
+    # child_WA_adult_UBI as a (UBI reform function, population) pair: the
+    # function's argument is the spend per eligible person, of which
+    # `split` goes to children.
+    children = baseline.aggregate("is_child")
+    adults = baseline.aggregate("is_WA_adult")
+    population = children + adults
+
+    def ubi_reform_func(value: float) -> tuple:
+        return ubi_reform(
+            eligibility=dict(child="is_child", WA_adult="is_WA_adult"),
+            amounts=dict(
+                child=value * population * split / children,
+                WA_adult=value * population * (1 - split) / adults,
+            ),
+        )
+
+    return ubi_reform_func, population
+
+
+class GaussianProcess:
+    # Zero-mean GP with a squared exponential kernel on standardised targets.
+    def __init__(self, length_scale: float = 0.3, noise: float = 1e-4):
+        self.length_scale = length_scale
+        self.noise = noise
+
+    def _kernel(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        distance = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-distance / (2 * self.length_scale**2))
+
+    def fit(self, x: np.ndarray, y: np.ndarray):
+        self.x = x
+        self.mean = y.mean()
+        self.scale = y.std() or 1
+        kernel = self._kernel(x, x) + self.noise * np.eye(len(x))
+        self.cholesky = np.linalg.cholesky(kernel)
+        self.alpha = np.linalg.solve(
+            self.cholesky.T,
+            np.linalg.solve(self.cholesky, (y - self.mean) / self.scale),
+        )
+        return self
+
+    def predict(self, x: np.ndarray) -> tuple:
+        cross = self._kernel(x, self.x)
+        mean = cross @ self.alpha
+        v = np.linalg.solve(self.cholesky, cross.T)
+        variance = np.clip(1 - (v**2).sum(axis=0), 1e-12, None)
+        return (
+            self.mean + self.scale * mean,
+            self.scale * np.sqrt(variance),
+        )
+
+
+def expected_improvement(
+    mean: np.ndarray, std: np.ndarray, best: float
+) -> np.ndarray:
+    # For minimisation.
+    z = (best - mean) / std
+    cdf = 0.5 * (1 + np.vectorize(math.erf)(z / math.sqrt(2)))
+    pdf = np.exp(-(z**2) / 2) / math.sqrt(2 * math.pi)
+    return (best - mean) * cdf + std * pdf
+
+
+class OptimisedReform(NamedTuple):
+    best: pd.Series
+    history: pd.DataFrame
+    simulations: int
+
+
+class ReformOptimiser:
+    """Searches for the budget-neutral design that minimises poverty.
+
+    A design is a level for each of the LEVERS, one of the DESIGNS (with a
+    child share of the spend for child_WA_adult_UBI) and whether the UBI
+    counts in means tests. Each design is given its budget-neutral UBI, as
+    in run_scenarios but not rounded to £1/week, and counts only if its
+    net cost is within `tolerance` of zero. After a few random designs, a Gaussian process
+    fitted to the poverty changes so far picks the candidate with the
+    highest expected improvement, until `budget` simulations have been
+    built.
+    """
+
+    def __init__(
+        self,
+        baseline: BaselineCache,
+        year: int = 2020,
+        simulation: type = CachedSimulation,
+        tolerance: float = 1e9,
+        candidates: int = 2000,
+        seed: int = 0,
+    ):
+        self.baseline = baseline
+        self.year = year
+        self.simulation = CountingSimulation(simulation)
+        self.tolerance = tolerance
+        self.rng = np.random.default_rng(seed)
+        self.candidates = [self.sample() for _ in range(candidates)]
+        self.tried = []
+        self.history = []
+
+    def sample(self) -> dict:
+        design = {
+            lever: round(self.rng.uniform(0, upper) / step) * step
+            for lever, (upper, step) in LEVERS.items()
+        }
+        design["UBI design"] = list(DESIGNS)[self.rng.integers(len(DESIGNS))]
+        design["Child share"] = (
+            round(self.rng.uniform(0, 1), 2)
+            if design["UBI design"] == "child_WA_adult_UBI"
+            else 0.0
+        )
+        design["UBI in means tests"] = bool(self.rng.integers(2))
+        return design
+
+    @staticmethod
+    def encode(design: dict) -> np.ndarray:
+        # Every feature scaled to [0, 1].
+        return np.array(
+            [design[lever] / upper for lever, (upper, _) in LEVERS.items()]
+            + [design["UBI design"] == name for name in DESIGNS]
+            + [design["Child share"], design["UBI in means tests"]],
+            dtype=float,
+        )
+
+    def evaluate(self, design: dict) -> dict:
+        ubi_reform_func, variables = DESIGNS[design["UBI design"]]
+        if ubi_reform_func is None:
+            ubi = child_split_UBI(design["Child share"], self.baseline)
+        else:
+            population = sum(map(self.baseline.aggregate, variables))
+            ubi = ubi_reform_func, population
+        self.tried += [design]
+        try:
+            result = evaluate_scenario(
+                design,
+                self.baseline,
+                year=self.year,
+                simulation=self.simulation,
+                design=ubi,
+                step=None,
+            )
+            feasible = (
+                abs(result["Net cost"]) <= self.tolerance
+                and result["UBI amount"] >= 0
+            )
+        except RuntimeError:  # no budget-neutral UBI found
+            result, feasible = {}, False
+        record = {**design, **result, "Feasible": feasible}
+        self.history += [record]
+        return record
+
+    def next_design(self) -> dict:
+        tried = pd.DataFrame(self.history)
+        feasible = tried[tried.Feasible]
+        untried = [
+            design for design in self.candidates if design not in self.tried
+        ]
+        if len(feasible) < 2:
+            return untried[self.rng.integers(len(untried))]
+        model = GaussianProcess().fit(
+            np.stack([self.encode(row) for _, row in feasible.iterrows()]),
+            feasible["Poverty change"].values,
+        )
+        mean, std = model.predict(
+            np.stack([self.encode(design) for design in untried])
+        )
+        improvement = expected_improvement(
+            mean, std, feasible["Poverty change"].min()
+        )
+        return untried[int(np.argmax(improvement))]
+
+    def optimise(self, budget: int = 100, initial: int = 5) -> OptimisedReform:
+        for _ in range(initial):
+            if self.simulation.built >= budget:
+                break
+            self.evaluate(self.candidates[len(self.tried)])
+        while self.simulation.built < budget:
+            self.evaluate(self.next_design())
+        history = pd.DataFrame(self.history)
+        feasible = history[history.Feasible]
+        best = (
+            feasible.loc[feasible["Poverty change"].idxmin()]
+            if len(feasible)
+            else None
+        )
+        return OptimisedReform(best, history, self.simulation.built)
+
+
+def optimise_reform(
+    baseline: BaselineCache,
+    budget: int = 100,
+    year: int = 2020,
+    simulation: type = CachedSimulation,
+    seed: int = 0,
+) -> OptimisedReform:
+    return ReformOptimiser(
+        baseline, year=year, simulation=simulation, seed=seed
+    ).optimise(budget)
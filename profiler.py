@@ -0,0 +1,100 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from openfisca_core.tracers import SimpleTracer
+
+
+class FormulaProfiler(SimpleTracer):
+    """Records how long each variable takes to calculate in a simulation.
+
+    Attach it with profile(sim) or FormulaProfiler(sim).attach(). For each
+    (variable, period) it records calls, cache hits and misses, total and
+    self (excluding nested calculations) wall time, and array size. Self
+    time is also kept per call stack for flame graphs.
+    """
+
+    def __init__(self, sim):
+        super().__init__()
+        self.simulation = sim.simulation
+        self.stats = defaultdict(
+            lambda: dict(
+                calls=0,
+                cache_hits=0,
+                cache_misses=0,
+                total_time=0.0,
+                self_time=0.0,
+                size=0,
+            )
+        )
+        self.stacks = defaultdict(float)
+        self._previous_tracer = None
+
+    def attach(self):
+        self._previous_tracer = self.simulation.tracer
+        self.simulation.tracer = self
+        return self
+
+    def detach(self):
+        self.simulation.tracer = self._previous_tracer
+
+    def record_calculation_start(self, variable: str, period):
+        cached = (
+            self.simulation.get_holder(variable).get_array(period) is not None
+        )
+        self.stack.append(
+            {
+                "name": variable,
+                "period": period,
+                "cached": cached,
+                "start": time.perf_counter(),
+                "child_time": 0.0,
+                "size": 0,
+            }
+        )
+
+    def record_calculation_result(self, value: np.ndarray):
+        self.stack[-1]["size"] = np.size(value)
+
+    def record_calculation_end(self):
+        frame = self.stack[-1]
+        elapsed = time.perf_counter() - frame["start"]
+        self_time = elapsed - frame["child_time"]
+        stats = self.stats[frame["name"], str(frame["period"])]
+        stats["calls"] += 1
+        stats["cache_hits" if frame["cached"] else "cache_misses"] += 1
+        stats["total_time"] += elapsed
+        stats["self_time"] += self_time
+        stats["size"] = max(stats["size"], frame["size"])
+        self.stacks[";".join(entry["name"] for entry in self.stack)] += (
+            self_time
+        )
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1]["child_time"] += elapsed
+
+    def table(self) -> pd.DataFrame:
+        table = pd.DataFrame.from_dict(self.stats, orient="index")
+        table.index.names = ["variable", "period"]
+        return table.sort_values("self_time", ascending=False)
+
+    def write_flamegraph(self, path: Path):
+        # Collapsed-stack format ("a;b;c microseconds"), as read by
+        # flamegraph.pl and speedscope.
+        Path(path).write_text(
+            "".join(
+                f"{stack} {int(seconds * 1e6)}\n"
+                for stack, seconds in sorted(self.stacks.items())
+            )
+        )
+
+
+@contextmanager
+def profile(sim):
+    profiler = FormulaProfiler(sim).attach()
+    try:
+        yield profiler
+    finally:
+        profiler.detach()
@@ -0,0 +1,151 @@
+from functools import partial
+import numpy as np
+import pandas as pd
+from openfisca_uk import CountryTaxBenefitSystem, Microsimulation
+from baseline import BaselineCache
+from reform import include_UBI_in_means_tests, solve_budget_neutral_ubi
+from scenarios import (
+    CountingSimulation,
+    funding_reforms,
+    funding_revenue,
+    scenario_metrics,
+    ubi_design,
+)
+
+YEARS = range(2020, 2025)
+UPRATING = 0.02  # Annual growth of monetary inputs.
+CURRENCY = "currency-GBP"
+# Endings of input names that hold amounts of money, for variables that
+# declare no unit.
+MONETARY_SUFFIXES = (
+    "_income",
+    "_cost",
+    "_costs",
+    "_contributions",
+    "_expenditure",
+    "_wealth",
+    "rent",
+)
+
+
+def is_monetary(name: str, variable) -> bool:
+    if variable.value_type != float:
+        return False
+    unit = getattr(variable, "unit", None)
+    if unit is not None:
+        return unit == CURRENCY
+    return name.endswith(MONETARY_SUFFIXES)
+
+
+class UpratedDataset:
+    """A dataset's `base_year` data, uprated to any later year.
+
+    The base year is loaded once. Every year shares its arrays as read-only
+    views, except the monetary inputs (see is_monetary), which are the
+    only arrays made anew for each later year, grown by `uprating` a year.
+    """
+
+    def __init__(
+        self, dataset, base_year: int = 2020, uprating: float = UPRATING
+    ):
+        self.dataset = dataset
+        self.base_year = base_year
+        self.uprating = uprating
+        self.name = (
+            f"{getattr(dataset, 'name', 'dataset')}_{base_year}+{uprating}"
+        )
+        self._arrays = None
+        self._monetary = None
+
+    def _base(self) -> tuple:
+        # Loads the base year on first use.
+        if self._arrays is None:
+            data = self.dataset.load(self.base_year)
+            arrays = {}
+            for name in data.keys():
+                arrays[name] = np.array(data[name])
+                arrays[name].flags.writeable = False
+            variables = CountryTaxBenefitSystem().variables
+            self._monetary = {
+                name
+                for name in arrays
+                if name in variables and is_monetary(name, variables[name])
+            }
+            self._arrays = arrays
+        return self._arrays, self._monetary
+
+    def factor(self, year: int) -> float:
+        return (1 + self.uprating) ** (year - self.base_year)
+
+    def load(self, year: int = None) -> dict:
+        arrays, monetary = self._base()
+        factor = self.factor(self.base_year if year is None else year)
+        return {
+            name: (
+                array * factor
+                if name in monetary and factor != 1
+                else array.view()
+            )
+            for name, array in arrays.items()
+        }
+
+
+def project(
+    params: dict,
+    years: range = YEARS,
+    dataset=None,
+    uprating: float = UPRATING,
+    simulation: type = Microsimulation,
+) -> pd.DataFrame:
+    """Evaluates one reform_df row in each of `years`.
+
+    The microdata is loaded once and its monetary inputs uprated in memory
+    (see UpratedDataset), and the funding reforms are built once, with
+    parameter changes covering the whole window. Each year gets its own
+    budget-neutral UBI, with the search starting from the previous year's
+    amount grown by `uprating`. Returns a year x metric panel of the
+    run_scenarios metrics, plus the simulations each year took.
+    """
+    if dataset is None:
+        from openfisca_uk_data import FRS as dataset
+    years = list(years)
+    window = f"year:{years[0]}:{len(years)}"
+    data = UpratedDataset(dataset, years[0], uprating)
+    reform = funding_reforms(params, period=window)
+    means_tests = (
+        (include_UBI_in_means_tests(),) if params["UBI in means tests"] else ()
+    )
+    rows = {}
+    ubi_amount = None
+    for year in years:
+        factory = CountingSimulation(partial(simulation, dataset=data))
+        baseline = BaselineCache(factory(year=year))
+        ubi_reform_func, population = ubi_design(params, baseline)
+        ubi_reform_func = partial(ubi_reform_func, period=window)
+        if means_tests:
+            if ubi_amount is None:
+                initial_amount = (
+                    funding_revenue(reform, baseline, year, factory)
+                    / population
+                )
+            else:
+                initial_amount = ubi_amount * (1 + uprating)
+            ubi_amount = solve_budget_neutral_ubi(
+                baseline,
+                tuple(reform),
+                ubi_reform_func,
+                population=population,
+                extra_reforms=means_tests,
+                initial_amount=initial_amount,
+                year=year,
+                simulation=factory,
+            ).amount
+        else:
+            revenue = funding_revenue(reform, baseline, year, factory)
+            ubi_amount = int(revenue / population / 52) * 52
+        reform_sim = factory(
+            (*reform, ubi_reform_func(ubi_amount), *means_tests), year=year
+        )
+        rows[year] = scenario_metrics(baseline, reform_sim)
+        rows[year]["Simulations"] = factory.built
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("year")
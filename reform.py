@@ -1,191 +1,153 @@
+from functools import lru_cache, wraps
+from typing import Callable, NamedTuple
 from openfisca_uk.api import *
 
 from openfisca_uk import Microsimulation
 from openfisca_uk.api import *
+from openfisca_core.parameters import ParameterNode
+from openfisca_core.taxbenefitsystems import TaxBenefitSystem
+from baseline import total
 
-def child_WA_adult_UBI(revenue: float, sim: Microsimulation, child_split: float) -> Reform:
-    adult_ubi = revenue * (1 - child_split) / sim.calc("is_WA_adult").sum()
-    child_ubi = revenue * child_split / sim.calc("is_child").sum()
-    class UBI(Variable):
-        value_type = float
-        entity = Person
-        definition_period = YEAR
-        
-        def formula(person, period, parameters):
-            return person("is_WA_adult", period) * adult_ubi + person("is_child", period) * child_ubi
-    
-    class gross_income(Variable):
-        value_type = float
-        entity = Person
-        label = u"Gross income, including benefits"
-        definition_period = YEAR
+class FingerprintedTuple(tuple):
+    pass
 
-        def formula(person, period, parameters):
-            COMPONENTS = [
-                "employment_income",
-                "pension_income",
-                "self_employment_income",
-                "property_income",
-                "savings_interest_income",
-                "dividend_income",
-                "miscellaneous_income",
-                "benefits",
-                "UBI"
-            ]
-            return add(person, period, COMPONENTS)
+def _canonical(value) -> str:
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return repr(value)
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_canonical(k)}: {_canonical(v)}" for k, v in sorted(value.items())) + "}"
+    return repr(float(value))
 
-    class reform(Reform):
-        def apply(self):
-            self.add_variable(UBI)
-            self.update_variable(gross_income)
-    
-    return reform
+def fingerprinted(factory):
+    # Tags each reform a factory returns with its name and arguments, e.g.
+    # "set_PT(50.0)", so results can be cached against the reform definition.
+    @wraps(factory)
+    def wrapper(*args, **kwargs):
+        reform = factory(*args, **kwargs)
+        if isinstance(reform, tuple):
+            reform = FingerprintedTuple(reform)
+        arguments = [_canonical(arg) for arg in args]
+        arguments += [f"{name}={_canonical(arg)}" for name, arg in sorted(kwargs.items())]
+        reform.fingerprint = f"{factory.__name__}({', '.join(arguments)})"
+        return reform
+    return wrapper
 
-def WA_adult_UBI(value: float) -> Reform:
-    class UBI(Variable):
-        value_type = float
-        entity = Person
-        definition_period = YEAR
-        
-        def formula(person, period, parameters):
-            return person("is_WA_adult", period) * value
-    
-    class gross_income(Variable):
-        value_type = float
-        entity = Person
-        label = u"Gross income, including benefits"
-        definition_period = YEAR
+def reform_fingerprint(reforms) -> str:
+    if isinstance(reforms, (tuple, list)) and not hasattr(reforms, "fingerprint"):
+        return "(" + ", ".join(reform_fingerprint(reform) for reform in reforms) + ")"
+    if not hasattr(reforms, "fingerprint"):
+        raise ValueError(f"{reforms} was not built by a fingerprinted reform factory.")
+    return reforms.fingerprint
 
-        def formula(person, period, parameters):
-            COMPONENTS = [
-                "employment_income",
-                "pension_income",
-                "self_employment_income",
-                "property_income",
-                "savings_interest_income",
-                "dividend_income",
-                "miscellaneous_income",
-                "benefits",
-                "UBI"
-            ]
-            return add(person, period, COMPONENTS)
+class gross_income(Variable):
+    value_type = float
+    entity = Person
+    label = u"Gross income, including benefits"
+    definition_period = YEAR
 
-    class reform(Reform):
-        def apply(self):
-            self.add_variable(UBI)
-            self.update_variable(gross_income)
-    
-    return reform
+    def formula(person, period, parameters):
+        COMPONENTS = [
+            "employment_income",
+            "pension_income",
+            "self_employment_income",
+            "property_income",
+            "savings_interest_income",
+            "dividend_income",
+            "miscellaneous_income",
+            "benefits",
+            "UBI"
+        ]
+        return add(person, period, COMPONENTS)
+
+@lru_cache(maxsize=None)
+def ubi_structure(eligibility: tuple) -> Reform:
+    # eligibility is a tuple of (group, flag variable) pairs; a flag of None
+    # makes everyone eligible. One reform class exists per eligibility rule,
+    # with each group's amount read from the ubi.amount parameters.
+    def ubi_parameters(params):
+        amounts = {
+            group: {"values": {"2010-01-01": {"value": 0}}}
+            for group, _ in eligibility
+        }
+        params.add_child("ubi", ParameterNode("ubi", data={"amount": amounts}))
+        return params
 
-def all_UBI(value: float) -> Reform:
     class UBI(Variable):
         value_type = float
         entity = Person
         definition_period = YEAR
-        
-        def formula(person, period, parameters):
-            return value
-    
-    class gross_income(Variable):
-        value_type = float
-        entity = Person
-        label = u"Gross income, including benefits"
-        definition_period = YEAR
 
         def formula(person, period, parameters):
-            COMPONENTS = [
-                "employment_income",
-                "pension_income",
-                "self_employment_income",
-                "property_income",
-                "savings_interest_income",
-                "dividend_income",
-                "miscellaneous_income",
-                "benefits",
-                "UBI"
-            ]
-            return add(person, period, COMPONENTS)
+            amount = parameters(period).ubi.amount
+            ubi = 0
+            for group, flag in eligibility:
+                if flag is None:
+                    ubi = ubi + getattr(amount, group)
+                else:
+                    ubi = ubi + (person(flag, period) > 0) * getattr(amount, group)
+            return ubi
 
     class reform(Reform):
         def apply(self):
+            self.modify_parameters(ubi_parameters)
             self.add_variable(UBI)
             self.update_variable(gross_income)
-    
+
     return reform
 
-def adult_UBI(value: float) -> Reform:
-    class UBI(Variable):
-        value_type = float
-        entity = Person
-        definition_period = YEAR
-        
-        def formula(person, period, parameters):
-            return (person("is_adult", period) > 0) * value
-    
-    class gross_income(Variable):
-        value_type = float
-        entity = Person
-        label = u"Gross income, including benefits"
-        definition_period = YEAR
+def set_ubi_amounts(amounts: dict, period="year:2018:5") -> tuple:
+    # Amounts only change through these parameter reforms; to re-evaluate a
+    # live simulation at another amount, see incremental.IncrementalUBI.
+    return tuple(set_parameter(f"ubi.amount.{group}", value, period) for group, value in amounts.items())
 
-        def formula(person, period, parameters):
-            COMPONENTS = [
-                "employment_income",
-                "pension_income",
-                "self_employment_income",
-                "property_income",
-                "savings_interest_income",
-                "dividend_income",
-                "miscellaneous_income",
-                "benefits",
-                "UBI"
-            ]
-            return add(person, period, COMPONENTS)
+@fingerprinted
+def ubi_reform(eligibility: dict, amounts: dict, period="year:2018:5") -> tuple:
+    return (ubi_structure(tuple(eligibility.items())), set_ubi_amounts(amounts, period))
 
-    class reform(Reform):
-        def apply(self):
-            self.add_variable(UBI)
-            self.update_variable(gross_income)
-    
-    return reform
+def child_WA_adult_UBI(revenue: float, sim: Microsimulation, child_split: float) -> tuple:
+    adult_ubi = revenue * (1 - child_split) / sim.calc("is_WA_adult").sum()
+    child_ubi = revenue * child_split / sim.calc("is_child").sum()
+    return ubi_reform(
+        eligibility=dict(child="is_child", WA_adult="is_WA_adult"),
+        amounts=dict(child=child_ubi, WA_adult=adult_ubi),
+    )
 
-def non_pensioner_UBI(value: float) -> Reform:
-    class UBI(Variable):
-        value_type = float
-        entity = Person
-        definition_period = YEAR
-        
-        def formula(person, period, parameters):
-            return (person("is_child", period) + person("is_WA_adult", period)) * value
-    
-    class gross_income(Variable):
-        value_type = float
-        entity = Person
-        label = u"Gross income, including benefits"
-        definition_period = YEAR
+@fingerprinted
+def WA_adult_UBI(value: float, period="year:2018:5") -> tuple:
+    return ubi_reform(eligibility=dict(WA_adult="is_WA_adult"), amounts=dict(WA_adult=value), period=period)
 
-        def formula(person, period, parameters):
-            COMPONENTS = [
-                "employment_income",
-                "pension_income",
-                "self_employment_income",
-                "property_income",
-                "savings_interest_income",
-                "dividend_income",
-                "miscellaneous_income",
-                "benefits",
-                "UBI"
-            ]
-            return add(person, period, COMPONENTS)
+@fingerprinted
+def all_UBI(value: float, period="year:2018:5") -> tuple:
+    return ubi_reform(eligibility=dict(everyone=None), amounts=dict(everyone=value), period=period)
 
-    class reform(Reform):
-        def apply(self):
-            self.add_variable(UBI)
-            self.update_variable(gross_income)
-    
-    return reform
+@fingerprinted
+def adult_UBI(value: float, period="year:2018:5") -> tuple:
+    return ubi_reform(eligibility=dict(adult="is_adult"), amounts=dict(adult=value), period=period)
+
+@fingerprinted
+def non_pensioner_UBI(value: float, period="year:2018:5") -> tuple:
+    return ubi_reform(
+        eligibility=dict(child="is_child", WA_adult="is_WA_adult"),
+        amounts=dict(child=value, WA_adult=value),
+        period=period,
+    )
+
+@fingerprinted
+def include_UBI_in_means_tests(fused: bool = False) -> Reform:
+    # With `fused`, the same formulas are computed from one gather of their
+    # person inputs per formula, with Housing Benefit and Income Support
+    # sharing one (see means_tests.py).
+    if fused:
+        from means_tests import FUSED_VARIABLES, SHARED_VARIABLES
 
-def include_UBI_in_means_tests() -> Reform:
+        class fused_reform(Reform):
+            def apply(self):
+                for variable in SHARED_VARIABLES:
+                    self.add_variable(variable)
+                for variable in FUSED_VARIABLES:
+                    self.update_variable(variable)
+
+        return fused_reform
 
     class universal_credit_income_reduction(Variable):
         value_type = float
@@ -388,6 +350,7 @@ def include_UBI_in_means_tests() -> Reform:
     
     return reform
 
+@fingerprinted
 def set_parameter(param: str, value: float, period="year:2018:5") -> Reform:
     def modifier(params):
         node = params
@@ -402,9 +365,11 @@ def set_parameter(param: str, value: float, period="year:2018:5") -> Reform:
             
     return reform
 
-def set_PA(value: float):
-    return set_parameter("tax.income_tax.allowances.personal_allowance.amount", value)
+@fingerprinted
+def set_PA(value: float, period="year:2018:5"):
+    return set_parameter("tax.income_tax.allowances.personal_allowance.amount", value, period)
 
+@fingerprinted
 def set_PA_for_WA_adults(value: float):
     class personal_allowance(Variable):
         value_type = float
@@ -428,8 +393,146 @@ def set_PA_for_WA_adults(value: float):
 
     return reform
 
-def set_PT(value: float):
-    return set_parameter("tax.national_insurance.class_1.thresholds.primary_threshold", value)
+@fingerprinted
+def set_PT(value: float, period="year:2018:5"):
+    return set_parameter("tax.national_insurance.class_1.thresholds.primary_threshold", value, period)
 
 def net_cost(baseline, simulation):
-    return simulation.calc("net_income").sum() - baseline.calc("net_income").sum()
\ No newline at end of file
+    return total(simulation, "net_income") - total(baseline, "net_income")
+
+
+class BudgetNeutralUBI(NamedTuple):
+    amount: float
+    net_cost: float
+    simulations: int
+
+
+def solve_budget_neutral_ubi(
+    baseline: Microsimulation,
+    funding_reforms: tuple,
+    ubi_reform_func: Callable[[float], Reform],
+    tolerance: float = 1e9,
+    population: float = None,
+    extra_reforms: tuple = (),
+    initial_amount: float = None,
+    step: float = 52,
+    year: int = 2020,
+    max_simulations: int = 25,
+    simulation: type = Microsimulation,
+    incremental: bool = False,
+) -> BudgetNeutralUBI:
+    """Finds the UBI amount at which the funding reforms pay for the UBI.
+
+    Net cost rises monotonically with the UBI amount, so the root is
+    bracketed and then narrowed with a secant step (Illinois variant of
+    regula falsi). With a `step`, amounts are restricted to multiples of it
+    and the answer is the one the £1/week stepping search would settle on.
+    Simulations are built with `simulation`, which takes the same arguments
+    as Microsimulation. With `incremental`, the funding reforms are instead
+    simulated once and each candidate amount only recomputes what depends
+    on the UBI (see incremental.IncrementalUBI).
+    """
+    simulations = 0
+    if population is None:
+        population = (
+            simulation(ubi_reform_func(1), year=year).calc("UBI").sum()
+        )
+        simulations += 1
+    if initial_amount is None:
+        tax_reform_sim = simulation(*funding_reforms, year=year)
+        simulations += 1
+        initial_amount = net_cost(tax_reform_sim, baseline) / population
+    unit = step or 1
+    start = int(initial_amount / unit) if step else initial_amount
+
+    costs = {}
+    if incremental:
+        from incremental import IncrementalUBI
+
+        model = IncrementalUBI(
+            funding_reforms,
+            ubi_reform_func,
+            extra_reforms,
+            year=year,
+            simulation=simulation,
+        )
+        simulations += 1
+
+    def cost_at(x):
+        nonlocal simulations
+        if x not in costs:
+            if simulations >= max_simulations:
+                raise RuntimeError(
+                    f"No budget-neutral UBI found in {max_simulations} simulations."
+                )
+            if incremental:
+                reform_sim = model.at(x * unit)
+            else:
+                reform_sim = simulation(
+                    (funding_reforms, ubi_reform_func(x * unit), extra_reforms),
+                    year=year,
+                )
+            costs[x] = net_cost(baseline, reform_sim)
+            simulations += 1
+        return costs[x]
+
+    def solution(x):
+        return BudgetNeutralUBI(x * unit, costs[x], simulations)
+
+    def snap(x):
+        return int(round(x)) if step else x
+
+    # Bracket the root, taking secant steps from the per-person cost guess.
+    a, f_a = start, cost_at(start)
+    if abs(f_a) < tolerance:
+        return solution(a)
+    b = snap(a - f_a / (population * unit))
+    if b == a:
+        b = a - 1 if f_a > 0 else a + 1
+    f_b = cost_at(b)
+    while f_a * f_b > 0 and abs(f_b) >= tolerance:
+        if f_b == f_a or (f_a - f_b) * (a - b) <= 0:
+            guess = b + 2 * (b - a)
+        else:
+            guess = snap(b - f_b * (b - a) / (f_b - f_a))
+            # Keep heading away from the starting side at least as fast.
+            if (guess - b) * (b - a) <= 0:
+                guess = b + (b - a)
+        a, f_a, b = b, f_b, guess
+        f_b = cost_at(b)
+    if abs(f_b) < tolerance:
+        root = b
+    else:
+        lo, hi = (a, b) if f_a < 0 else (b, a)
+        f_lo, f_hi = costs[lo], costs[hi]
+        root = None
+        side = 0
+        while root is None:
+            if step and abs(hi - lo) <= 1:
+                break
+            x = snap(lo - f_lo * (hi - lo) / (f_hi - f_lo))
+            if step:
+                x = min(max(x, min(lo, hi) + 1), max(lo, hi) - 1)
+            f_x = cost_at(x)
+            if abs(f_x) < tolerance:
+                root = x
+            elif f_x < 0:
+                lo, f_lo = x, f_x
+                if side == -1:
+                    f_hi /= 2
+                side = -1
+            else:
+                hi, f_hi = x, f_x
+                if side == 1:
+                    f_lo /= 2
+                side = 1
+        if root is None:
+            # No multiple of `step` is within tolerance: the stepping search
+            # stops oscillating on the side it started from.
+            return solution(lo if start <= lo else hi)
+    if step:
+        # Walk back towards the start while still within tolerance.
+        direction = 1 if start > root else -1
+        while root != start and abs(cost_at(root + direction)) < tolerance:
+            root += direction
+    return solution(root)
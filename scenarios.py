@@ -0,0 +1,351 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from openfisca_uk import Microsimulation
+import pandas as pd
+from tqdm import tqdm
+from baseline import BaselineCache
+from metrics import ImpactReport
+from simulation_cache import CachedSimulation
+from storage import compact_microsimulation
+from uncertainty import ReplicateWeights
+from reform import (
+    WA_adult_UBI,
+    all_UBI,
+    adult_UBI,
+    non_pensioner_UBI,
+    set_PA,
+    set_PT,
+    set_PA_for_WA_adults,
+    include_UBI_in_means_tests,
+    net_cost,
+    solve_budget_neutral_ubi,
+)
+
+FUNDING_COLUMNS = (
+    "Pensioner PA (£/year)",
+    "Adult PA (£/year)",
+    "NI Primary Threshold (£/week)",
+)
+DESIGN_COLUMNS = ("UBI for children", "UBI for pensioners")
+MEANS_TEST_COLUMNS = ("UBI in means tests",)
+SCENARIO_COLUMNS = FUNDING_COLUMNS + DESIGN_COLUMNS + MEANS_TEST_COLUMNS
+
+# The ImpactReport metrics each scenario is scored on.
+SCENARIO_METRICS = (
+    "poverty",
+    "deep_poverty",
+    "gini",
+    "winners",
+    "losers",
+    "net_cost",
+)
+
+
+class CountingSimulation:
+    # Builds simulations with `factory`, counting how many it builds.
+    def __init__(self, factory):
+        self.factory = factory
+        self.built = 0
+
+    def __call__(self, *reforms, **kwargs):
+        self.built += 1
+        return self.factory(*reforms, **kwargs)
+
+
+def funding_reforms(params: dict, period: str = None) -> list:
+    # `period` overrides the years the parameter changes apply to.
+    options = {} if period is None else {"period": period}
+    reform = []
+    reform += [set_PA(float(params["Pensioner PA (£/year)"]), **options)]
+    reform += [set_PA_for_WA_adults(float(params["Adult PA (£/year)"]))]
+    reform += [
+        set_PT(float(params["NI Primary Threshold (£/week)"]), **options)
+    ]
+    return reform
+
+
+def funding_revenue(
+    reform: list,
+    baseline: BaselineCache,
+    year: int = 2020,
+    simulation: type = CachedSimulation,
+) -> float:
+    tax_reform_sim = simulation(*reform, year=year)
+    return net_cost(tax_reform_sim, baseline)
+
+
+def ubi_design(params: dict, baseline: BaselineCache) -> tuple:
+    # The UBI reform function and its eligible population.
+    if params["UBI for children"]:  # doesn't handle non-adult UBIs
+        if params["UBI for pensioners"]:
+            return all_UBI, baseline.aggregate("people")
+        return non_pensioner_UBI, (
+            baseline.aggregate("is_child") + baseline.aggregate("is_WA_adult")
+        )
+    if params["UBI for pensioners"]:
+        return adult_UBI, baseline.aggregate("is_adult")
+    return WA_adult_UBI, baseline.aggregate("is_WA_adult")
+
+
+def create_reform(
+    params: dict,
+    baseline: BaselineCache,
+    year: int = 2020,
+    simulation: type = CachedSimulation,
+    incremental: bool = False,
+    revenue: float = None,
+    design: tuple = None,
+    step: float = 52,
+):
+    # `design` overrides the (UBI reform function, population) pair that
+    # ubi_design() would pick from the UBI columns of params. The UBI amount
+    # is a multiple of `step` (£1/week by default), or exact if it is None.
+    reform = funding_reforms(params)
+    if revenue is None:
+        revenue = funding_revenue(reform, baseline, year, simulation)
+    ubi_reform_func, population = design or ubi_design(params, baseline)
+    if params["UBI in means tests"]:
+        ubi_amount = solve_budget_neutral_ubi(
+            baseline,
+            tuple(reform),
+            ubi_reform_func,
+            population=population,
+            extra_reforms=(include_UBI_in_means_tests(),),
+            initial_amount=revenue / population,
+            year=year,
+            step=step,
+            simulation=simulation,
+            incremental=incremental,
+        ).amount
+        reform += [ubi_reform_func(ubi_amount), include_UBI_in_means_tests()]
+    else:
+        ubi_amount = revenue / population
+        if step:
+            ubi_amount = int(ubi_amount / step) * step
+        reform += [ubi_reform_func(ubi_amount)]
+    return tuple(reform)
+
+
+def evaluate_scenario(
+    params: dict,
+    baseline: BaselineCache,
+    year: int = 2020,
+    simulation: type = CachedSimulation,
+    revenue: float = None,
+    design: tuple = None,
+    replicates: ReplicateWeights = None,
+    step: float = 52,
+) -> dict:
+    # With `replicates`, bootstrap bounds are added as "<metric> lower" and
+    # "<metric> upper".
+    reform = create_reform(
+        params,
+        baseline,
+        year=year,
+        simulation=simulation,
+        revenue=revenue,
+        design=design,
+        step=step,
+    )
+    reform_sim = simulation(reform, year=year)
+    return scenario_metrics(baseline, reform_sim, replicates)
+
+
+def scenario_metrics(
+    baseline: BaselineCache,
+    reform_sim,
+    replicates: ReplicateWeights = None,
+) -> dict:
+    report = ImpactReport.compute(baseline, reform_sim, SCENARIO_METRICS)
+    result = {
+        "UBI amount": reform_sim.calc("UBI").max(),
+        "Poverty change": report.change("poverty"),
+        "Deep poverty change": report.change("deep_poverty"),
+        "Winners": report.winners,
+        "Losers": report.losers,
+        "Inequality change": report.change("gini"),
+        "Net cost": report.net_cost,
+    }
+    if replicates is not None:
+        result.update(replicates.intervals(reform_sim))
+    return result
+
+
+class ScenarioPlanner:
+    """Evaluates a scenario grid as a DAG of funding reform -> UBI design ->
+    means-test option.
+
+    Each distinct funding reform's revenue is simulated once, and each
+    distinct scenario is evaluated once, however many rows share them.
+    After evaluate(), `stats` reports the node counts and how many
+    simulation requests the sharing saved over evaluating every row
+    separately. These count simulations asked of `simulation`; with a
+    CachedSimulation, some may be read from disk rather than computed.
+    """
+
+    def __init__(self, reform_df: pd.DataFrame):
+        self.reform_df = reform_df
+        self.scenarios = {}
+        self.row_scenarios = []
+        for i in range(len(reform_df)):
+            params = reform_df.iloc[i]
+            key = tuple(params[column] for column in SCENARIO_COLUMNS)
+            self.scenarios.setdefault(key, params)
+            self.row_scenarios += [key]
+        num_funding = len(FUNDING_COLUMNS)
+        num_design = num_funding + len(DESIGN_COLUMNS)
+        self.funding_nodes = {key[:num_funding] for key in self.scenarios}
+        self.design_nodes = {key[:num_design] for key in self.scenarios}
+        self.stats = {}
+
+    def evaluate(
+        self,
+        baseline: BaselineCache,
+        year: int = 2020,
+        simulation: type = CachedSimulation,
+        replicates: ReplicateWeights = None,
+    ) -> pd.DataFrame:
+        simulation = CountingSimulation(simulation)
+        revenues = {}
+        results = {}
+        scenario_simulations = {}
+        for key, params in tqdm(self.scenarios.items()):
+            funding = key[: len(FUNDING_COLUMNS)]
+            if funding not in revenues:
+                revenues[funding] = funding_revenue(
+                    funding_reforms(params), baseline, year, simulation
+                )
+            requested = simulation.built
+            results[key] = evaluate_scenario(
+                params,
+                baseline,
+                year=year,
+                simulation=simulation,
+                revenue=revenues[funding],
+                replicates=replicates,
+            )
+            scenario_simulations[key] = simulation.built - requested
+        # Evaluated row by row, each row simulates its funding reform and
+        # then everything its scenario needed.
+        unshared = sum(
+            1 + scenario_simulations[key] for key in self.row_scenarios
+        )
+        self.stats = {
+            "rows": len(self.row_scenarios),
+            "funding reforms": len(self.funding_nodes),
+            "UBI designs": len(self.design_nodes),
+            "scenarios": len(self.scenarios),
+            "simulation requests": simulation.built,
+            "simulation requests saved": unshared - simulation.built,
+        }
+        return pd.DataFrame(
+            [results[key] for key in self.row_scenarios],
+            index=self.reform_df.index,
+        )
+
+
+# Each pool worker loads the baseline once, in _init_worker, and reuses it
+# for every row it is handed.
+_worker_baseline = None
+_worker_year = None
+_worker_simulation = None
+_worker_replicates = None
+
+
+def _init_worker(
+    year: int, simulation: type, replicates: int = None, barrier=None
+):
+    # With a `barrier`, each worker waits until every worker has built its
+    # baseline.
+    global _worker_baseline, _worker_year, _worker_simulation
+    global _worker_replicates
+    _worker_baseline = BaselineCache(simulation(year=year))
+    # Computes every baseline array and aggregate the metrics read.
+    ImpactReport.compute(_worker_baseline, _worker_baseline, SCENARIO_METRICS)
+    _worker_year = year
+    _worker_simulation = simulation
+    if replicates:
+        _worker_replicates = ReplicateWeights(_worker_baseline, replicates)
+    if barrier is not None:
+        barrier.wait()
+
+
+def _evaluate_in_worker(params: dict) -> dict:
+    return evaluate_scenario(
+        params,
+        _worker_baseline,
+        year=_worker_year,
+        simulation=_worker_simulation,
+        replicates=_worker_replicates,
+    )
+
+
+def run_scenarios(
+    reform_df: pd.DataFrame,
+    workers: int = 1,
+    baseline: BaselineCache = None,
+    year: int = 2020,
+    cache: bool = True,
+    dataset=None,
+    compact: bool = False,
+    replicates: int = None,
+) -> pd.DataFrame:
+    """Evaluates every row of reform_df, returning one row of metrics each.
+
+    With workers > 1 the rows are spread over a process pool; otherwise they
+    run serially in this process (against `baseline` if given), which is
+    easier to debug. Rows come back in reform_df order either way, and rows
+    sharing a scenario or funding reform are evaluated once (see
+    ScenarioPlanner). With `cache`, simulation results are read from and
+    written to the on-disk simulation cache. `dataset` replaces the survey
+    data, e.g. with a synthetic.SyntheticFRS. With `compact`, simulations
+    store their arrays at reduced precision (see
+    storage.validate_compact_storage for the effect on results); they are
+    not cached, so `cache` must be off. With `replicates`, each metric also gets 95% bootstrap bounds
+    from that many household-resampling replicates (see
+    uncertainty.ReplicateWeights).
+    """
+    if compact and cache:
+        raise ValueError(
+            "Compact simulations are not cached; pass cache=False."
+        )
+    if compact:
+        simulation = compact_microsimulation
+    elif cache:
+        simulation = CachedSimulation
+    else:
+        simulation = Microsimulation
+    if dataset is not None:
+        simulation = partial(simulation, dataset=dataset)
+    planner = ScenarioPlanner(reform_df)
+    if workers > 1:
+        # Workers share nothing, so only duplicate rows are deduplicated.
+        scenarios = list(planner.scenarios.values())
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(scenarios)),
+            initializer=_init_worker,
+            initargs=(year, simulation, replicates),
+        ) as pool:
+            results = dict(
+                zip(
+                    planner.scenarios,
+                    tqdm(
+                        pool.map(_evaluate_in_worker, scenarios),
+                        total=len(scenarios),
+                    ),
+                )
+            )
+        return pd.DataFrame(
+            [results[key] for key in planner.row_scenarios],
+            index=reform_df.index,
+        )
+    if baseline is None:
+        baseline = BaselineCache(simulation(year=year))
+    return planner.evaluate(
+        baseline,
+        year=year,
+        simulation=simulation,
+        replicates=(
+            ReplicateWeights(baseline, replicates) if replicates else None
+        ),
+    )
@@ -0,0 +1,160 @@
+"""Local HTTP service that evaluates reform specs.
+
+    python -m service [--port PORT] [--workers N] [--cache-size N]
+
+POST /evaluate with a JSON object holding one reform_df row, e.g.
+
+    {"Adult PA (£/year)": 2500, "Pensioner PA (£/year)": 12500,
+     "NI Primary Threshold (£/week)": 50, "UBI for children": false,
+     "UBI for pensioners": false, "UBI in means tests": true}
+
+returns the run_scenarios metrics for it. GET /stats reports cache hits,
+coalesced requests and evaluations.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from scenarios import SCENARIO_COLUMNS, _evaluate_in_worker, _init_worker
+from simulation_cache import CachedSimulation
+
+STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Error"}
+
+
+def parse_spec(spec: dict) -> tuple:
+    # The spec as a hashable key, so equivalent specs (2500 and 2500.0,
+    # say) share cache entries.
+    missing = [column for column in SCENARIO_COLUMNS if column not in spec]
+    if missing:
+        raise ValueError(f"Missing reform spec fields: {missing}.")
+    key = []
+    for column in SCENARIO_COLUMNS:
+        value = spec[column]
+        if column.startswith("UBI"):
+            if not isinstance(value, bool):
+                raise ValueError(f"{column} must be true or false.")
+        else:
+            value = float(value)
+        key += [value]
+    return tuple(key)
+
+
+def _ready() -> bool:
+    return True
+
+
+class ReformService:
+    """Evaluates specs on a pool of workers that each hold a warm baseline.
+
+    Identical specs in flight share one evaluation, and the last
+    `cache_size` answers are kept, least recently used first out.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        cache_size: int = 256,
+        year: int = 2020,
+        simulation: type = CachedSimulation,
+    ):
+        barrier = multiprocessing.Barrier(workers)
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(year, simulation, None, barrier),
+        )
+        # Start every worker. None runs a task until all have built their
+        # baselines and met at the barrier, so once one task is done every
+        # worker is ready to serve.
+        wait([self.pool.submit(_ready) for _ in range(workers)])
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.stats = dict(requests=0, cache_hits=0, coalesced=0, evaluated=0)
+
+    async def evaluate(self, key: tuple) -> dict:
+        self.stats["requests"] += 1
+        if key in self.cache:
+            self.stats["cache_hits"] += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if key in self.in_flight:
+            self.stats["coalesced"] += 1
+        else:
+            self.in_flight[key] = asyncio.ensure_future(self._evaluate(key))
+        return await asyncio.shield(self.in_flight[key])
+
+    async def _evaluate(self, key: tuple) -> dict:
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.pool,
+                _evaluate_in_worker,
+                dict(zip(SCENARIO_COLUMNS, key)),
+            )
+        finally:
+            del self.in_flight[key]
+        result = {name: float(value) for name, value in result.items()}
+        self.stats["evaluated"] += 1
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    async def respond(self, method: str, path: str, body: bytes) -> tuple:
+        if method == "GET" and path == "/stats":
+            return 200, self.stats
+        if method != "POST" or path != "/evaluate":
+            return 404, {"error": f"No route for {method} {path}."}
+        try:
+            key = parse_spec(json.loads(body))
+        except (ValueError, TypeError, AttributeError) as error:
+            return 400, {"error": str(error)}
+        try:
+            return 200, await self.evaluate(key)
+        except Exception as error:
+            return 500, {"error": repr(error)}
+
+    async def handle(self, reader, writer):
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            length = 0
+            line = await reader.readline()
+            while line not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+                line = await reader.readline()
+            body = await reader.readexactly(length)
+            status, payload = await self.respond(method, path, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "Malformed request."}
+        content = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            "Connection: close\r\n\r\n".encode() + content
+        )
+        await writer.drain()
+        writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cache-size", type=int, default=256)
+    parser.add_argument("--year", type=int, default=2020)
+    args = parser.parse_args()
+    service = ReformService(args.workers, args.cache_size, args.year)
+    print(f"Serving on http://{args.host}:{args.port}")
+    asyncio.run(service.serve(args.host, args.port))
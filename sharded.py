@@ -0,0 +1,301 @@
+import numpy as np
+import pandas as pd
+from openfisca_uk import CountryTaxBenefitSystem, Microsimulation
+from metrics import ImpactReport
+
+ENTITY_IDS = {
+    "person": "person_id",
+    "benunit": "benunit_id",
+    "household": "household_id",
+}
+
+
+# Points each WeightedSketch keeps by default before merging neighbours.
+SKETCH_POINTS = 20_000
+
+
+def _rows(mask: np.ndarray):
+    # A slice when the selected rows are contiguous, so array-backed (e.g.
+    # HDF5) datasets read only those rows; otherwise their indices.
+    rows = np.flatnonzero(mask)
+    if len(rows) and rows[-1] - rows[0] == len(rows) - 1:
+        return slice(int(rows[0]), int(rows[-1]) + 1)
+    return rows
+
+
+class HouseholdShards:
+    """Splits a dataset into `shards` slices by household.
+
+    Each shard keeps its households whole, with their benefit units and
+    people, so any formula that only looks within a household gives the
+    same values as on the full dataset. The rows of every shard and the
+    entity of every variable are worked out once per year, from the id
+    columns alone; each shard then reads only its own rows.
+    """
+
+    def __init__(self, dataset, shards: int):
+        self.dataset = dataset
+        self.shards = shards
+        self.name = getattr(dataset, "name", "dataset")
+        self._plans = {}
+
+    def plan(self, year: int = None) -> tuple:
+        # (data, variable -> entity, shard -> entity -> rows) for `year`.
+        if year not in self._plans:
+            data = self.dataset.load(year)
+            household_id = np.array(data["household_id"])
+            bounds = [
+                chunk[-1]
+                for chunk in np.array_split(np.sort(household_id), self.shards)
+                if len(chunk)
+            ][:-1]
+            shard_of = {
+                "household": np.searchsorted(bounds, household_id),
+                "person": np.searchsorted(
+                    bounds, np.array(data["person_household_id"])
+                ),
+            }
+            benunit_id = np.array(data["benunit_id"])
+            order = np.argsort(benunit_id)
+            members = order[
+                np.searchsorted(
+                    benunit_id[order], np.array(data["person_benunit_id"])
+                )
+            ]
+            shard_of["benunit"] = np.empty(len(benunit_id), dtype=int)
+            shard_of["benunit"][members] = shard_of["person"]
+            variables = CountryTaxBenefitSystem().variables
+            entities = {}
+            for name in data.keys():
+                if name.startswith("person_"):
+                    entities[name] = "person"
+                elif name in ENTITY_IDS.values():
+                    entities[name] = name[: -len("_id")]
+                else:
+                    entities[name] = variables[name].entity.key
+            rows = [
+                {
+                    entity: _rows(shards == shard)
+                    for entity, shards in shard_of.items()
+                }
+                for shard in range(self.shards)
+            ]
+            self._plans[year] = data, entities, rows
+        return self._plans[year]
+
+    def shard(self, shard: int) -> "ShardedDataset":
+        return ShardedDataset(self, shard)
+
+
+class ShardedDataset:
+    # One shard of a HouseholdShards, as a dataset for Microsimulation.
+    def __init__(self, shards: HouseholdShards, shard: int):
+        self.shards = shards
+        self.shard = shard
+        self.name = f"{shards.name}_{shard}of{shards.shards}"
+
+    def load(self, year: int = None) -> dict:
+        data, entities, rows = self.shards.plan(year)
+        rows = rows[self.shard]
+        return {
+            name: np.array(data[name][rows[entity]])
+            for name, entity in entities.items()
+        }
+
+
+class WeightedSketch:
+    """Mergeable weighted sample of values, with optional payload columns.
+
+    Whenever it holds more than `max_points` points, adjacent sorted points
+    are merged into weighted centroids, bounding memory at the cost of
+    approximate quantiles and Gini coefficients. With max_points=None every
+    point is kept, so quantiles are exact but memory grows with the
+    dataset.
+    """
+
+    def __init__(self, max_points: int = SKETCH_POINTS):
+        self.max_points = max_points
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+        self.payload = None
+
+    def add(self, values, weights, payload: np.ndarray = None):
+        self.values = np.concatenate([self.values, np.asarray(values, float)])
+        self.weights = np.concatenate(
+            [self.weights, np.asarray(weights, float)]
+        )
+        if payload is not None:
+            payload = np.asarray(payload, float).reshape(len(values), -1)
+            self.payload = (
+                payload
+                if self.payload is None
+                else np.vstack([self.payload, payload])
+            )
+        if self.max_points is not None and len(self.values) > self.max_points:
+            self._compress()
+
+    def merge(self, other: "WeightedSketch"):
+        self.add(other.values, other.weights, other.payload)
+
+    def _compress(self):
+        order = np.argsort(self.values)
+        groups = np.arange(len(order)) * (self.max_points // 2) // len(order)
+        weights = np.bincount(groups, weights=self.weights[order])
+        self.values = np.bincount(
+            groups, weights=(self.values * self.weights)[order]
+        ) / np.where(weights > 0, weights, 1)
+        if self.payload is not None:
+            self.payload = np.stack(
+                [
+                    np.bincount(groups, weights=column[order])
+                    for column in self.payload.T
+                ],
+                axis=1,
+            )
+        self.weights = weights
+
+    def _sorted(self) -> tuple:
+        order = np.argsort(self.values)
+        return self.values[order], self.weights[order], order
+
+    def quantile(self, q: float) -> float:
+        values, weights, _ = self._sorted()
+        cumulative = (np.cumsum(weights) - 0.5 * weights) / weights.sum()
+        return np.interp(q, cumulative, values)
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def gini(self) -> float:
+        values, weights, _ = self._sorted()
+        cumw = np.cumsum(weights)
+        cumxw = np.cumsum(values * weights)
+        return np.sum(cumxw[1:] * cumw[:-1] - cumxw[:-1] * cumw[1:]) / (
+            cumxw[-1] * cumw[-1]
+        )
+
+    def decile_totals(self) -> np.ndarray:
+        # Payload column totals by weighted decile of the values.
+        values, weights, order = self._sorted()
+        share = np.cumsum(weights) / weights.sum()
+        decile = np.clip(np.ceil(share * 10), 1, 10).astype(int)
+        return np.stack(
+            [
+                np.bincount(decile, weights=column[order], minlength=11)[1:11]
+                for column in self.payload.T
+            ],
+            axis=1,
+        )
+
+
+class ImpactAccumulator:
+    """Accumulates ImpactReport metrics over household shards."""
+
+    SUMS = {
+        "net_income": "net_income",
+        "poverty_gap": "poverty_gap_bhc",
+    }
+    MEANS = {
+        "poverty": "in_poverty_bhc",
+        "deep_poverty": "in_deep_poverty_bhc",
+    }
+
+    def __init__(self, max_points: int = SKETCH_POINTS):
+        self.totals = {}
+        self.sketches = {
+            "baseline": WeightedSketch(max_points),
+            "reform": WeightedSketch(max_points),
+            "deciles": WeightedSketch(max_points),
+        }
+
+    def _add_total(self, key, value):
+        self.totals[key] = self.totals.get(key, 0) + value
+
+    def add(self, baseline: Microsimulation, reform_sim: Microsimulation):
+        for side, sim in (("baseline", baseline), ("reform", reform_sim)):
+            for metric, variable in self.SUMS.items():
+                self._add_total((side, metric), sim.calc(variable).sum())
+            for metric, variable in self.MEANS.items():
+                flag = sim.calc(variable, map_to="person")
+                self._add_total(
+                    (side, metric),
+                    (np.array(flag) * np.array(flag.weights)).sum(),
+                )
+        income = reform_sim.calc("household_net_income", map_to="person")
+        baseline_income = baseline.calc(
+            "household_net_income", map_to="person"
+        )
+        weights = np.array(baseline_income.weights)
+        self._add_total("people", weights.sum())
+        gain = np.array(income) - np.array(baseline_income)
+        self._add_total("winners", weights[gain > 1].sum())
+        self._add_total("losers", weights[gain < -1].sum())
+        self.sketches["baseline"].add(baseline_income, weights)
+        self.sketches["reform"].add(income, weights)
+        self.sketches["deciles"].add(
+            baseline.calc("equiv_household_net_income", map_to="person"),
+            weights,
+            np.stack(
+                [
+                    np.array(baseline_income) * weights,
+                    np.array(income) * weights,
+                ],
+                axis=1,
+            ),
+        )
+
+    def merge(self, other: "ImpactAccumulator"):
+        for key, value in other.totals.items():
+            self._add_total(key, value)
+        for name, sketch in other.sketches.items():
+            self.sketches[name].merge(sketch)
+
+    def report(self) -> ImpactReport:
+        levels = {}
+        for side in ("baseline", "reform"):
+            levels[side] = {
+                metric: self.totals[side, metric] for metric in self.SUMS
+            }
+            for metric in self.MEANS:
+                levels[side][metric] = (
+                    self.totals[side, metric] / self.totals["people"]
+                )
+            levels[side]["gini"] = self.sketches[side].gini()
+            levels[side]["median"] = self.sketches[side].median()
+        totals = self.sketches["deciles"].decile_totals()
+        return ImpactReport(
+            levels["baseline"],
+            levels["reform"],
+            winners=self.totals["winners"] / self.totals["people"],
+            losers=self.totals["losers"] / self.totals["people"],
+            decile_shares=pd.DataFrame(
+                totals / totals.sum(axis=0),
+                columns=["baseline", "reform"],
+                index=pd.RangeIndex(1, 11, name="decile"),
+            ),
+        )
+
+
+def run_sharded(
+    reform: tuple,
+    dataset,
+    shards: int,
+    year: int = 2020,
+    max_points: int = SKETCH_POINTS,
+) -> ImpactReport:
+    """Evaluates a reform one household shard at a time.
+
+    Only one shard's baseline and reform simulations are alive at once, so
+    memory is bounded by the shard size plus three sketches of at most
+    `max_points` points (unbounded, but exact, with max_points=None). This
+    assumes formulas do not depend on population-wide aggregates.
+    """
+    accumulator = ImpactAccumulator(max_points)
+    household_shards = HouseholdShards(dataset, shards)
+    for shard in range(shards):
+        shard_data = household_shards.shard(shard)
+        baseline = Microsimulation(dataset=shard_data, year=year)
+        reform_sim = Microsimulation(reform, dataset=shard_data, year=year)
+        accumulator.add(baseline, reform_sim)
+        del baseline, reform_sim
+    return accumulator.report()
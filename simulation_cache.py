@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from functools import lru_cache
+from importlib.metadata import version
+from pathlib import Path
+import numpy as np
+from microdf import MicroSeries
+from openfisca_uk import Microsimulation
+from reform import reform_fingerprint
+
+CACHE_DIR = Path(os.environ.get("UBI_CACHE_DIR", ".cache/simulations"))
+MAX_CACHE_BYTES = 20e9
+# The modules defining the Variables that reforms add or replace.
+FORMULA_MODULES = ("reform.py", "means_tests.py")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+@lru_cache(maxsize=None)
+def formulas_digest() -> str:
+    root = Path(__file__).parent
+    return _digest(
+        "|".join((root / name).read_text() for name in FORMULA_MODULES)
+    )
+
+
+def simulation_key(reforms: tuple, year: int, dataset=None) -> str:
+    fingerprint = reform_fingerprint(reforms)
+    dataset_name = getattr(dataset, "name", "default")
+    return _digest(
+        f"{fingerprint}|{year}|{dataset_name}|{version('openfisca-uk')}"
+        f"|{formulas_digest()}"
+    )
+
+
+def _write(path: Path, write):
+    # Writes under a temporary name and moves the file into place, so
+    # other processes never read it half-written.
+    handle, temp = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            write(file)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+class CachedSimulation:
+    """A Microsimulation whose calc() results persist on disk.
+
+    Results are stored as memory-mapped .npy files under a directory named
+    by a hash of the reform fingerprint, year, dataset, openfisca-uk
+    version and the source of FORMULA_MODULES. The underlying
+    Microsimulation is only built once a calc() misses, and after each
+    write the least recently used simulations are evicted to keep the
+    cache under `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        *reforms,
+        year: int = 2020,
+        dataset=None,
+        cache_dir: Path = None,
+        max_bytes: float = MAX_CACHE_BYTES,
+    ):
+        self.reforms = reforms
+        self.year = year
+        self.dataset = dataset
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self.path = self.cache_dir / simulation_key(reforms, year, dataset)
+        self.max_bytes = max_bytes
+        self._sim = None
+
+    @property
+    def sim(self) -> Microsimulation:
+        if self._sim is None:
+            options = {} if self.dataset is None else {"dataset": self.dataset}
+            self._sim = Microsimulation(
+                *self.reforms, year=self.year, **options
+            )
+        return self._sim
+
+    @property
+    def simulation(self):
+        return self.sim.simulation
+
+    def calc(self, variable: str, **options) -> MicroSeries:
+        name = _digest(f"{variable}|{sorted(options.items())}")
+        values_file = self.path / f"{name}.values.npy"
+        weights_file = self.path / f"{name}.weights.npy"
+        if values_file.exists() and weights_file.exists():
+            try:
+                os.utime(self.path)
+                return MicroSeries(
+                    np.load(values_file, mmap_mode="r"),
+                    weights=np.load(weights_file, mmap_mode="r"),
+                )
+            except FileNotFoundError:
+                pass  # Evicted by another process since.
+            except ValueError:
+                pass  # Python objects, saved before they were converted.
+        result = self.sim.calc(variable, **options)
+        self.path.mkdir(parents=True, exist_ok=True)
+        description = (
+            f"{reform_fingerprint(self.reforms)} year={self.year} "
+            f"dataset={getattr(self.dataset, 'name', 'default')}\n"
+        )
+        _write(
+            self.path / "fingerprint.txt",
+            lambda file: file.write(description.encode("utf-8")),
+        )
+        weights = np.array(result.weights)
+        values = np.array(result)
+        if values.dtype == object:
+            # Enum names and other strings, as fixed-width unicode so the
+            # file can be memory-mapped.
+            values = values.astype(str)
+        _write(weights_file, lambda file: np.save(file, weights))
+        _write(values_file, lambda file: np.save(file, values))
+        evict(self.max_bytes, self.cache_dir, keep=self.path)
+        return result
+
+
+def cache_entries(cache_dir: Path = None) -> list:
+    # (last access time, size in bytes, path) for each cached simulation.
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    if not cache_dir.exists():
+        return []
+    entries = []
+    for path in cache_dir.iterdir():
+        try:
+            if path.is_dir():
+                entries += [
+                    (
+                        path.stat().st_mtime,
+                        sum(file.stat().st_size for file in path.iterdir()),
+                        path,
+                    )
+                ]
+        except FileNotFoundError:
+            pass  # Evicted by another process while listing.
+    return entries
+
+
+def evict(
+    max_bytes: float = MAX_CACHE_BYTES,
+    cache_dir: Path = None,
+    keep: Path = None,
+) -> int:
+    # Removes least recently used simulations, other than `keep`, until the
+    # cache fits.
+    entries = sorted(cache_entries(cache_dir))
+    total_bytes = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total_bytes <= max_bytes:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total_bytes -= size
+        removed += 1
+    return removed
+
+
+def invalidate(
+    reforms: tuple = None,
+    year: int = 2020,
+    dataset=None,
+    cache_dir: Path = None,
+) -> int:
+    # Removes one simulation's results, or the whole cache if no reform is
+    # given.
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    if reforms is not None:
+        paths = [cache_dir / simulation_key(reforms, year, dataset)]
+    else:
+        paths = [path for _, _, path in cache_entries(cache_dir)]
+    paths = [path for path in paths if path.exists()]
+    for path in paths:
+        shutil.rmtree(path)
+    return len(paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Manage the on-disk simulation result cache."
+    )
+    parser.add_argument("command", choices=("list", "evict", "invalidate"))
+    parser.add_argument("--max-gb", type=float, default=MAX_CACHE_BYTES / 1e9)
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR)
+    args = parser.parse_args()
+    if args.command == "list":
+        for accessed, size, path in sorted(cache_entries(args.cache_dir)):
+            fingerprint = (path / "fingerprint.txt").read_text().strip()
+            print(
+                f"{time.ctime(accessed)}  {size / 1e6:8.1f}MB  {fingerprint}"
+            )
+    elif args.command == "evict":
+        removed = evict(args.max_gb * 1e9, args.cache_dir)
+        print(f"Evicted {removed} cached simulations.")
+    else:
+        removed = invalidate(cache_dir=args.cache_dir)
+        print(f"Removed {removed} cached simulations.")
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from openfisca_core.data_storage import InMemoryStorage
+from openfisca_core.indexed_enums import EnumArray
+from openfisca_uk import Microsimulation
+from baseline import BaselineCache
+from metrics import ImpactReport
+
+
+def compact_array(array: np.ndarray) -> np.ndarray:
+    # float32 for amounts, int32 for counts and int8 codes for enums; flags
+    # are already stored as bool.
+    if isinstance(array, EnumArray):
+        if len(array.possible_values) <= np.iinfo(np.int8).max:
+            return EnumArray(
+                array.astype(np.int8, copy=False), array.possible_values
+            )
+        return array
+    if array.dtype == np.float64:
+        return array.astype(np.float32)
+    if array.dtype == np.int64:
+        return array.astype(np.int32)
+    return array
+
+
+class CompactStorage(InMemoryStorage):
+    # Compacts each array as it is stored, whether an input or a result.
+    def put(self, value, period):
+        super().put(compact_array(value), period)
+
+
+def use_compact_storage(sim: Microsimulation) -> Microsimulation:
+    """Stores a simulation's inputs and results at reduced precision.
+
+    Each holder's in-memory storage is swapped for a CompactStorage holding
+    compacted copies of its arrays, so the simulation's tracer is left
+    alone.
+    """
+    simulation = sim.simulation
+    for variable in simulation.tax_benefit_system.variables:
+        holder = simulation.get_holder(variable)
+        storage = holder._memory_storage
+        if isinstance(storage, CompactStorage):
+            continue
+        compact = CompactStorage(is_eternal=storage.is_eternal)
+        for period in storage.get_known_periods():
+            compact.put(storage.get(period), period)
+        holder._memory_storage = compact
+    return sim
+
+
+def compact_microsimulation(*reforms, **kwargs) -> Microsimulation:
+    # A drop-in for Microsimulation as a `simulation` factory.
+    return use_compact_storage(Microsimulation(*reforms, **kwargs))
+
+
+def validate_compact_storage(reform: tuple, year: int = 2020) -> pd.DataFrame:
+    """Compares impact metrics of a reform at full and compact precision.
+
+    Returns each metric at both precisions with the absolute and relative
+    drift, largest relative drift first.
+    """
+    reports = {}
+    for name, factory in (
+        ("float64", Microsimulation),
+        ("compact", compact_microsimulation),
+    ):
+        baseline = BaselineCache(factory(year=year))
+        reform_sim = factory(reform, year=year)
+        reports[name] = ImpactReport.compute(
+            baseline, reform_sim
+        ).to_series()
+    drift = pd.DataFrame(reports)
+    drift["absolute_drift"] = (drift.compact - drift.float64).abs()
+    drift["relative_drift"] = drift.absolute_drift / drift.float64.abs()
+    return drift.sort_values("relative_drift", ascending=False)
@@ -0,0 +1,140 @@
+import heapq
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from baseline import BaselineCache
+from scenarios import FUNDING_COLUMNS, evaluate_scenario
+from simulation_cache import CachedSimulation
+
+SURFACES = {
+    "UBI amount": "ubi_amount",
+    "Poverty change": "poverty_change",
+    "Inequality change": "gini_change",
+}
+
+
+class PolicySurface:
+    """Budget-neutral UBI, poverty and Gini change over two funding levers.
+
+    `axes` maps two of the FUNDING_COLUMNS to (low, high) ranges; `fixed`
+    gives the remaining scenario parameters, as in a reform_df row. The
+    sweep starts from a `start` x `start` grid and then repeatedly splits
+    the cell whose centre is furthest from the average of its corners,
+    relative to each surface's range, so points gather where the surfaces
+    curve. Every point is appended to `checkpoint` when it is evaluated,
+    and a rerun of the same sweep with that checkpoint replays the saved
+    points instead of simulating them again.
+    """
+
+    def __init__(
+        self,
+        axes: dict,
+        fixed: dict,
+        baseline: BaselineCache,
+        checkpoint: Path = None,
+        year: int = 2020,
+        simulation: type = CachedSimulation,
+        start: int = 3,
+    ):
+        if len(axes) != 2 or not set(axes) <= set(FUNDING_COLUMNS):
+            raise ValueError(
+                f"Expected two of {FUNDING_COLUMNS} as axes, got {list(axes)}."
+            )
+        self.axes = list(axes)
+        self.ranges = [tuple(map(float, axes[axis])) for axis in self.axes]
+        self.fixed = dict(fixed)
+        self.baseline = baseline
+        self.checkpoint = None if checkpoint is None else Path(checkpoint)
+        self.year = year
+        self.simulation = simulation
+        self.start = start
+        self.settings = json.dumps(
+            dict(axes=self.axes, fixed=self.fixed, year=year), default=str
+        )
+        self.points = {}
+        self.simulated = 0
+        if self.checkpoint is not None and self.checkpoint.exists():
+            for line in self.checkpoint.read_text().splitlines():
+                point = json.loads(line)
+                if point["settings"] == self.settings:
+                    self.points[point["x"], point["y"]] = point["result"]
+
+    def evaluate(self, x: float, y: float) -> dict:
+        if (x, y) not in self.points:
+            params = {**self.fixed, self.axes[0]: x, self.axes[1]: y}
+            result = evaluate_scenario(
+                params,
+                self.baseline,
+                year=self.year,
+                simulation=self.simulation,
+            )
+            result = {name: float(result[name]) for name in SURFACES}
+            self.points[x, y] = result
+            self.simulated += 1
+            if self.checkpoint is not None:
+                self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.checkpoint, "a") as f:
+                    point = dict(
+                        settings=self.settings, x=x, y=y, result=result
+                    )
+                    f.write(json.dumps(point) + "\n")
+        return self.points[x, y]
+
+    def _scales(self) -> dict:
+        values = pd.DataFrame(list(self.points.values()))
+        spread = values.max() - values.min()
+        return {name: spread[name] or 1 for name in SURFACES}
+
+    def _curvature(self, cell: tuple) -> float:
+        x0, y0, x1, y1 = cell
+        corners = [
+            self.evaluate(x, y)
+            for x, y in ((x0, y0), (x0, y1), (x1, y0), (x1, y1))
+        ]
+        centre = self.evaluate((x0 + x1) / 2, (y0 + y1) / 2)
+        scales = self._scales()
+        return max(
+            abs(centre[name] - np.mean([corner[name] for corner in corners]))
+            / scales[name]
+            for name in SURFACES
+        )
+
+    def sweep(self, max_points: int = 50) -> pd.DataFrame:
+        """Evaluates up to `max_points` points (counting checkpointed ones)
+        and returns them all."""
+        xs = np.linspace(*self.ranges[0], self.start)
+        ys = np.linspace(*self.ranges[1], self.start)
+        cells = [
+            (xs[i], ys[j], xs[i + 1], ys[j + 1])
+            for i in range(self.start - 1)
+            for j in range(self.start - 1)
+        ]
+        queue = []
+        for cell in cells:
+            heapq.heappush(queue, (-self._curvature(cell), cell))
+        # Splitting a cell evaluates up to 4 edge midpoints and 4 centres.
+        while queue and len(self.points) + 8 <= max_points:
+            _, (x0, y0, x1, y1) = heapq.heappop(queue)
+            xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+            for cell in (
+                (x0, y0, xm, ym),
+                (x0, ym, xm, y1),
+                (xm, y0, x1, ym),
+                (xm, ym, x1, y1),
+            ):
+                heapq.heappush(queue, (-self._curvature(cell), cell))
+        return self.table()
+
+    def table(self) -> pd.DataFrame:
+        table = pd.DataFrame(
+            list(self.points.values()),
+            index=pd.MultiIndex.from_tuples(
+                list(self.points), names=self.axes
+            ),
+        )
+        return table.rename(columns=SURFACES).sort_index()
+
+    def surface(self, metric: str) -> pd.DataFrame:
+        # One metric as a grid over the two axes, NaN where not sampled.
+        return self.table()[metric].unstack(self.axes[1])
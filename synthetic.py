@@ -0,0 +1,121 @@
+from functools import lru_cache
+import numpy as np
+
+UK_POPULATION = 66e6
+
+
+@lru_cache(maxsize=2)
+def generate_microdata(persons: int = 100_000, seed: int = 0) -> dict:
+    """Generates household, benefit unit and person input arrays.
+
+    Each household is one benefit unit of one or two adults (pensioners in
+    about a quarter of households) and up to three children. Households are
+    added until there are `persons` people or fewer; weights scale the
+    result to the UK population.
+    """
+    rng = np.random.default_rng(seed)
+    # Every household has a member, so this many always suffices.
+    num_households = persons
+    is_pensioner_household = rng.random(num_households) < 0.25
+    num_adults = rng.choice((1, 2), num_households, p=(0.45, 0.55))
+    num_children = rng.choice(
+        (0, 1, 2, 3), num_households, p=(0.55, 0.2, 0.18, 0.07)
+    )
+    num_children[is_pensioner_household] = 0
+    size = num_adults + num_children
+    num_households = np.searchsorted(np.cumsum(size), persons, side="right")
+    size = size[:num_households]
+    num_adults = num_adults[:num_households]
+    is_pensioner_household = is_pensioner_household[:num_households]
+    num_persons = size.sum()
+
+    household = np.repeat(np.arange(num_households), size)
+    first_member = np.cumsum(size) - size
+    position = np.arange(num_persons) - first_member[household]
+    is_adult = position < num_adults[household]
+    is_pensioner = is_adult & is_pensioner_household[household]
+    is_child = ~is_adult
+    is_WA_adult = is_adult & ~is_pensioner
+
+    age = np.where(
+        is_child,
+        rng.integers(0, 18, num_persons),
+        np.where(
+            is_pensioner,
+            rng.integers(66, 91, num_persons),
+            rng.integers(18, 66, num_persons),
+        ),
+    )
+    employed = is_WA_adult & (rng.random(num_persons) < 0.75)
+    hours_worked = employed * rng.uniform(8, 45, num_persons)
+    employment_income = employed * rng.lognormal(9.9, 0.8, num_persons)
+    self_employed = is_WA_adult & ~employed & (rng.random(num_persons) < 0.2)
+    self_employment_income = self_employed * rng.lognormal(9.5, 1, num_persons)
+    pension_income = is_pensioner * rng.lognormal(8.8, 0.9, num_persons)
+    savings_interest_income = is_adult * rng.exponential(150, num_persons)
+    dividend_income = (
+        is_adult
+        * (rng.random(num_persons) < 0.1)
+        * rng.lognormal(8, 1.2, num_persons)
+    )
+    property_income = (
+        is_adult
+        * (rng.random(num_persons) < 0.05)
+        * rng.lognormal(9, 0.8, num_persons)
+    )
+    has_young_child = np.bincount(
+        household, weights=is_child & (age < 12), minlength=num_households
+    )
+    childcare_cost = (
+        (position == 0)
+        * (has_young_child[household] > 0)
+        * (rng.random(num_persons) < 0.3)
+        * rng.lognormal(8, 0.6, num_persons)
+    )
+    is_renter = rng.random(num_households) < 0.35
+    rent = is_renter * rng.lognormal(8.9, 0.4, num_households)
+
+    role = np.where(is_adult, "adult", "child")
+    return {
+        "person_id": np.arange(num_persons),
+        "benunit_id": np.arange(num_households),
+        "household_id": np.arange(num_households),
+        "person_benunit_id": household,
+        "person_household_id": household,
+        "person_benunit_role": role,
+        "person_household_role": role,
+        "household_weight": np.full(
+            num_households, UK_POPULATION / num_persons
+        ),
+        "age": age,
+        "is_adult": is_adult,
+        "is_child": is_child,
+        "is_WA_adult": is_WA_adult,
+        "is_SP_age": is_pensioner,
+        "hours_worked": hours_worked,
+        "employment_income": employment_income,
+        "self_employment_income": self_employment_income,
+        "pension_income": pension_income,
+        "savings_interest_income": savings_interest_income,
+        "dividend_income": dividend_income,
+        "property_income": property_income,
+        "childcare_cost": childcare_cost,
+        "rent": rent,
+    }
+
+
+class SyntheticFRS:
+    """An in-memory stand-in for the FRS dataset, for Microsimulation.
+
+    Microsimulation(dataset=SyntheticFRS(persons=10_000), year=2020) loads
+    generated microdata in place of the survey, so runs need no network or
+    survey files. Every year receives the same microdata.
+    """
+
+    def __init__(self, persons: int = 100_000, seed: int = 0):
+        self.persons = persons
+        self.seed = seed
+        self.name = f"synthetic_frs_{persons}_{seed}"
+
+    def load(self, year: int = None) -> dict:
+        return generate_microdata(self.persons, self.seed)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from conftest import Region, ToySimulation
+
+
+@pytest.fixture
+def index(toy_baseline):
+    return toy_baseline.index()
+
+
+def person_groups(toy_arrays) -> dict:
+    # Each grouping's label for every person, worked out row by row.
+    sim = ToySimulation(toy_arrays)
+    income = sim.calc("equiv_household_net_income", map_to="person")
+    family_type = sim.calc("family_type", map_to="person")
+    region = sim.calc("region", map_to="person")
+    is_adult = np.array(sim.calc("is_adult"))
+    is_WA_adult = np.array(sim.calc("is_WA_adult"))
+    return {
+        "decile": list(np.array(income.decile_rank()).astype(int)),
+        "family_type": list(np.array(family_type)),
+        "region": [list(Region)[code].name for code in region],
+        "age_group": [
+            (
+                "Child"
+                if not adult
+                else "Working-age adult" if working_age else "Pensioner"
+            )
+            for adult, working_age in zip(is_adult, is_WA_adult)
+        ],
+    }
+
+
+def test_breakdown_matches_group_by_group_sums(index, toy_arrays):
+    values = np.random.default_rng(1).normal(size=len(index.weights))
+    table = index.breakdown(values)
+    for grouping, labels in person_groups(toy_arrays).items():
+        labels = np.array(labels)
+        for label in table.loc[grouping].index:
+            members = labels == label
+            total = (values * index.weights)[members].sum()
+            weight = index.weights[members].sum()
+            row = table.loc[(grouping, label)]
+            assert row.total == pytest.approx(total)
+            assert row.weight == pytest.approx(weight)
+            if weight:
+                assert row["mean"] == pytest.approx(total / weight)
+
+
+def test_enum_codes_map_names_and_codes_to_people(index, toy_arrays):
+    groups = person_groups(toy_arrays)
+    for grouping in ("family_type", "region"):
+        codes, labels = index.groups[grouping]
+        assert [labels[code] for code in codes] == groups[grouping]
+
+
+def test_shares_match_loop_and_zero_empty_deciles(index, toy_arrays):
+    rng = np.random.default_rng(2)
+    codes = rng.integers(0, 3, len(index.weights))
+    deciles = np.array(person_groups(toy_arrays)["decile"])
+    mask = (deciles != 3) & (rng.random(len(codes)) < 0.8)
+    shares = index.shares(codes, 3, "decile", mask=mask)
+    for decile in range(1, 11):
+        members = mask & (deciles == decile)
+        total = index.weights[members].sum()
+        for code in range(3):
+            expected = (
+                index.weights[members & (codes == code)].sum() / total
+                if total
+                else 0
+            )
+            assert shares[decile - 1, code] == pytest.approx(expected)
+    assert not shares[2].any()
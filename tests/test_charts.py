@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("plotly")
+
+from charts import NAMES, intra_decile_graph_data
+from conftest import ToySimulation
+
+# Relative gains on and around each band edge, and the infinite and NaN
+# gains of households with no baseline income.
+GAINS = (-0.05, -0.0499, -1e-3, -0.0009, 0, 1e-3, 0.0011, 0.05, 0.0501, 0.2)
+
+
+def band(rel_gain: float) -> str:
+    # The band rules of the original loop: each band includes its upper
+    # edge and excludes its lower one.
+    if rel_gain > 0.05:
+        return NAMES[0]
+    if rel_gain > 1e-3:
+        return NAMES[1]
+    if rel_gain > -1e-3:
+        return NAMES[2]
+    if rel_gain > -0.05:
+        return NAMES[3]
+    return NAMES[4]
+
+
+def expected_table(baseline, reform_sims, amounts) -> pd.DataFrame:
+    decile = np.array(
+        baseline.calc(
+            "equiv_household_net_income", map_to="person"
+        ).decile_rank()
+    ).astype(int)
+    before = baseline.calc("household_net_income", map_to="person")
+    weights = np.array(before.weights)
+    before = np.array(before)
+    rows = []
+    for amount, reform_sim in zip(amounts, reform_sims):
+        after = np.array(
+            reform_sim.calc("household_net_income", map_to="person")
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_gain = (after - before) / before
+        for name in NAMES:
+            for j in range(1, 11):
+                in_decile = (decile == j) & ~np.isnan(rel_gain)
+                total = weights[in_decile].sum()
+                in_band = [
+                    in_decile[i] and band(rel_gain[i]) == name
+                    for i in range(len(rel_gain))
+                ]
+                rows += [
+                    {
+                        "UBI": f"£{amount}/week",
+                        "fraction": (
+                            weights[in_band].sum() / total if total else 0
+                        ),
+                        "decile": j,
+                        "Outcome": name,
+                    }
+                ]
+    return pd.DataFrame(rows)
+
+
+def test_intra_decile_matches_band_loop(toy_arrays, toy_baseline):
+    rng = np.random.default_rng(3)
+    equiv_income = toy_arrays["equiv_household_net_income"][1]
+    households = len(equiv_income)
+    decile = np.array(
+        toy_baseline.calc("equiv_household_net_income").decile_rank()
+    ).astype(int)
+    before = np.full(households, 1000.0)
+    # Infinite and NaN gains, and a decile with only NaN gains.
+    no_income = np.arange(households) < 3
+    no_income |= decile == 3
+    reform_sims = []
+    for _ in range(2):
+        after = before + before * rng.choice(GAINS, households)
+        after[:3] = (10, -10, 0)
+        after[decile == 3] = 0
+        reform_sims += [
+            ToySimulation(
+                {**toy_arrays, "household_net_income": ("household", after)}
+            )
+        ]
+    before[no_income] = 0
+    toy_arrays["household_net_income"] = ("household", before)
+    table = intra_decile_graph_data(
+        toy_baseline, *reform_sims, amounts=(45, 60)
+    )
+    expected = expected_table(toy_baseline, reform_sims, (45, 60))
+    pd.testing.assert_frame_equal(
+        table[["UBI", "decile", "Outcome"]],
+        expected[["UBI", "decile", "Outcome"]],
+        check_dtype=False,
+    )
+    np.testing.assert_allclose(table.fraction, expected.fraction, atol=1e-12)
+    assert (table[table.decile == 3].fraction == 0).all()
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("openfisca_uk")
+
+from openfisca_uk import Microsimulation
+from incremental import TARGET_VARIABLES, IncrementalUBI, UBISweep
+from reform import (
+    WA_adult_UBI,
+    include_UBI_in_means_tests,
+    set_PA_for_WA_adults,
+    set_PT,
+)
+
+FUNDING = (set_PA_for_WA_adults(2500), set_PT(50))
+AMOUNTS = (2600, 0, 5200, 3120)
+
+
+def assert_matches_full_simulation(model, amount, extra_reforms, dataset):
+    full_sim = Microsimulation(
+        (FUNDING, WA_adult_UBI(amount), extra_reforms),
+        year=2020,
+        dataset=dataset,
+    )
+    sim = model.at(amount)
+    for variable in TARGET_VARIABLES:
+        np.testing.assert_allclose(
+            np.array(sim.calc(variable, weighted=False), dtype=float),
+            np.array(full_sim.calc(variable, weighted=False), dtype=float),
+            rtol=1e-9,
+            atol=1e-6,
+            err_msg=f"{variable} at £{amount}/year",
+        )
+
+
+def test_sweep_matches_full_simulation(dataset):
+    sweep = UBISweep(FUNDING, WA_adult_UBI, dataset=dataset)
+    for amount in AMOUNTS:
+        assert_matches_full_simulation(sweep, amount, (), dataset)
+
+
+def test_incremental_matches_full_simulation_in_means_tests(dataset):
+    means_tests = (include_UBI_in_means_tests(),)
+    model = IncrementalUBI(
+        FUNDING, WA_adult_UBI, extra_reforms=means_tests, dataset=dataset
+    )
+    for amount in AMOUNTS:
+        assert_matches_full_simulation(model, amount, means_tests, dataset)
+
+
+def test_sweep_rejects_ubi_in_means_tests(dataset):
+    with pytest.raises(ValueError):
+        UBISweep(
+            (*FUNDING, include_UBI_in_means_tests()),
+            WA_adult_UBI,
+            dataset=dataset,
+        )
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("openfisca_uk")
+
+from openfisca_uk import Microsimulation
+from means_tests import FUSED_VARIABLES
+from reform import (
+    WA_adult_UBI,
+    include_UBI_in_means_tests,
+    set_PA_for_WA_adults,
+    set_PT,
+)
+
+FUNDING = (set_PA_for_WA_adults(2500), set_PT(50))
+
+
+@pytest.mark.parametrize("amount", (0, 2600, 5200))
+def test_fused_formulas_match_original(dataset, amount):
+    sims = {
+        fused: Microsimulation(
+            (
+                FUNDING,
+                WA_adult_UBI(amount),
+                include_UBI_in_means_tests(fused=fused),
+            ),
+            year=2020,
+            dataset=dataset,
+        )
+        for fused in (False, True)
+    }
+    for variable in FUSED_VARIABLES:
+        name = variable.__name__
+        np.testing.assert_allclose(
+            sims[True].simulation.calculate_add(name, 2020),
+            sims[False].simulation.calculate_add(name, 2020),
+            rtol=1e-9,
+            atol=1e-6,
+            err_msg=name,
+        )
+    # Housing Benefit and Income Support read one shared weekly gather.
+    shared = sims[True].simulation.get_holder("weekly_means_test_income")
+    assert shared.get_known_periods()
+    for name in ("net_income", "household_net_income", "in_poverty_bhc"):
+        np.testing.assert_allclose(
+            np.array(sims[True].calc(name, weighted=False), dtype=float),
+            np.array(sims[False].calc(name, weighted=False), dtype=float),
+            rtol=1e-9,
+            atol=1e-6,
+            err_msg=name,
+        )
@@ -0,0 +1,34 @@
+import gc
+import weakref
+import numpy as np
+import pytest
+
+pytest.importorskip("openfisca_uk")
+
+from projection import UpratedDataset
+
+
+class CountingDataset:
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.name = dataset.name
+        self.loads = 0
+
+    def load(self, year: int = None) -> dict:
+        self.loads += 1
+        return self.dataset.load(year)
+
+
+def test_base_year_loaded_once_and_released(dataset):
+    source = CountingDataset(dataset)
+    data = UpratedDataset(source, uprating=0.1)
+    base, later = data.load(2020), data.load(2022)
+    assert source.loads == 1
+    assert data._monetary
+    for name in data._monetary:
+        np.testing.assert_allclose(later[name], base[name] * 1.1**2)
+    # The arrays live on the instance, so nothing keeps it alive after use.
+    reference = weakref.ref(data)
+    del data, base, later
+    gc.collect()
+    assert reference() is None
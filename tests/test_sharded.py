@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("openfisca_uk")
+
+from openfisca_uk import Microsimulation
+from metrics import ImpactReport
+from reform import WA_adult_UBI, set_PA_for_WA_adults, set_PT
+from sharded import HouseholdShards, run_sharded
+
+REFORM = (set_PA_for_WA_adults(2500), set_PT(50), WA_adult_UBI(3120))
+SHARDS = 4
+
+
+@pytest.fixture(scope="module")
+def whole(dataset):
+    return ImpactReport.compute(
+        Microsimulation(year=2020, dataset=dataset),
+        Microsimulation(REFORM, year=2020, dataset=dataset),
+    ).to_series()
+
+
+def test_shards_partition_the_dataset(dataset):
+    shards = HouseholdShards(dataset, SHARDS)
+    parts = [shards.shard(shard).load(2020) for shard in range(SHARDS)]
+    for name, values in dataset.load(2020).items():
+        np.testing.assert_array_equal(
+            np.concatenate([part[name] for part in parts]), values
+        )
+
+
+def test_exact_sketches_match_whole_dataset(dataset, whole):
+    sharded = run_sharded(REFORM, dataset, SHARDS, max_points=None).to_series()
+    # Sums and means are exact; the sketches' quantile and decile rules
+    # differ from microdf's only at ties and boundaries.
+    exact = [metric for metric in whole.index if "median" not in metric]
+    exact = [metric for metric in exact if "decile" not in metric]
+    np.testing.assert_allclose(
+        sharded[exact], whole[exact], rtol=1e-9, atol=1e-12
+    )
+    np.testing.assert_allclose(sharded["median"], whole["median"], rtol=1e-3)
+    deciles = [metric for metric in whole.index if "decile" in metric]
+    np.testing.assert_allclose(sharded[deciles], whole[deciles], atol=1e-3)
+
+
+def test_bounded_sketches_stay_close(dataset, whole):
+    sharded = run_sharded(REFORM, dataset, SHARDS, max_points=500)
+    sharded = sharded.to_series()
+    for metric in ("gini", "median"):
+        assert sharded[metric] == pytest.approx(whole[metric], rel=1e-2)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("openfisca_uk")
+
+from microdf import MicroSeries
+from simulation_cache import CachedSimulation
+
+
+class ObjectSimulation:
+    # Returns Python-object arrays, as calc() can for enum variables.
+    def calc(self, variable, **options):
+        return MicroSeries(
+            np.array(["SINGLE", "COUPLE", "LONE_PARENT"], dtype=object),
+            weights=np.array([1.0, 2.0, 3.0]),
+        )
+
+
+def test_object_results_round_trip(tmp_path):
+    first = CachedSimulation(year=2020, cache_dir=tmp_path)
+    first._sim = ObjectSimulation()
+    expected = first.calc("family_type")
+    second = CachedSimulation(year=2020, cache_dir=tmp_path)
+    cached = second.calc("family_type")
+    assert second._sim is None
+    assert list(cached) == list(expected)
+    np.testing.assert_array_equal(cached.weights, expected.weights)
+
+
+def test_enum_variable_round_trip(dataset, tmp_path):
+    first = CachedSimulation(year=2020, dataset=dataset, cache_dir=tmp_path)
+    expected = first.calc("family_type", map_to="person")
+    second = CachedSimulation(year=2020, dataset=dataset, cache_dir=tmp_path)
+    cached = second.calc("family_type", map_to="person")
+    assert second._sim is None
+    np.testing.assert_array_equal(
+        np.array(cached).astype(str), np.array(expected).astype(str)
+    )
+    np.testing.assert_array_equal(cached.weights, expected.weights)
@@ -0,0 +1,87 @@
+from functools import partial
+import pytest
+
+pytest.importorskip("openfisca_uk")
+
+from openfisca_uk import Microsimulation
+from reform import (
+    WA_adult_UBI,
+    include_UBI_in_means_tests,
+    net_cost,
+    set_PA_for_WA_adults,
+    set_PT,
+    solve_budget_neutral_ubi,
+)
+from simulation_cache import CachedSimulation
+
+FUNDING = (set_PA_for_WA_adults(2500), set_PT(50))
+MEANS_TESTS = (include_UBI_in_means_tests(),)
+TOLERANCE = 1e9
+
+
+@pytest.fixture(scope="module")
+def problem(dataset):
+    baseline = Microsimulation(year=2020, dataset=dataset)
+    population = baseline.calc("is_WA_adult").sum()
+    revenue = net_cost(
+        Microsimulation(*FUNDING, year=2020, dataset=dataset), baseline
+    )
+    return baseline, population, revenue / population
+
+
+def cost_at(baseline, amount, dataset):
+    reform_sim = Microsimulation(
+        (FUNDING, WA_adult_UBI(amount), MEANS_TESTS),
+        year=2020,
+        dataset=dataset,
+    )
+    return net_cost(baseline, reform_sim)
+
+
+def stepping_search(baseline, initial_amount, dataset):
+    # The £1/week search the solver replaced.
+    amount = int(initial_amount / 52) * 52
+    cost = cost_at(baseline, amount, dataset)
+    tried = []
+    while abs(cost) >= TOLERANCE and amount not in tried:
+        tried += [amount]
+        amount += 52 * (1 if cost < 0 else -1)
+        cost = cost_at(baseline, amount, dataset)
+    return amount
+
+
+def solve(problem, simulation, incremental=False):
+    baseline, population, initial_amount = problem
+    return solve_budget_neutral_ubi(
+        baseline,
+        FUNDING,
+        WA_adult_UBI,
+        tolerance=TOLERANCE,
+        population=population,
+        extra_reforms=MEANS_TESTS,
+        initial_amount=initial_amount,
+        simulation=simulation,
+        incremental=incremental,
+    )
+
+
+def test_solver_matches_stepping_search(problem, dataset):
+    result = solve(problem, partial(Microsimulation, dataset=dataset))
+    baseline, _, initial_amount = problem
+    assert result.amount == stepping_search(baseline, initial_amount, dataset)
+    assert result.net_cost == pytest.approx(
+        cost_at(baseline, result.amount, dataset)
+    )
+
+
+def test_incremental_solver_uses_the_simulation_dataset(
+    problem, dataset, tmp_path
+):
+    full = solve(problem, partial(Microsimulation, dataset=dataset))
+    incremental = solve(
+        problem,
+        partial(CachedSimulation, dataset=dataset, cache_dir=tmp_path),
+        incremental=True,
+    )
+    assert incremental.amount == full.amount
+    assert incremental.net_cost == pytest.approx(full.net_cost, abs=1)
@@ -0,0 +1,33 @@
+import numpy as np
+from conftest import ToySimulation
+from uncertainty import ReplicateWeights
+
+
+def test_net_income_replicates_match_loop(toy_baseline, toy_arrays):
+    # Built from calc() and variable metadata alone, so the toy baseline,
+    # which has no underlying simulation, is enough.
+    replicates = ReplicateWeights(toy_baseline, replicates=5)
+    sim = ToySimulation(toy_arrays)
+    household_ids = list(toy_arrays["household_id"][1])
+    net_income = sim.calc("net_income")
+    expected = np.zeros(5)
+    for value, weight, household_id in zip(
+        np.array(net_income),
+        net_income.weights,
+        toy_arrays["benunit_household_id"][1],
+    ):
+        row = household_ids.index(household_id)
+        for replicate in range(5):
+            expected[replicate] += (
+                value * weight * replicates.factors[row, replicate]
+            )
+    np.testing.assert_allclose(
+        replicates.baseline_levels["net_income"], expected
+    )
+
+
+def test_unchanged_reform_has_zero_intervals(toy_baseline):
+    replicates = ReplicateWeights(toy_baseline, replicates=5)
+    bounds = replicates.intervals(toy_baseline)
+    for metric in ("Poverty change", "Inequality change", "Net cost"):
+        assert bounds[f"{metric} lower"] == bounds[f"{metric} upper"] == 0
@@ -0,0 +1,130 @@
+import numpy as np
+from baseline import BaselineCache, _variables
+
+
+def _positions(ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # Index into `ids` of each of `values`.
+    order = np.argsort(ids)
+    return order[np.searchsorted(ids[order], values)]
+
+
+def replicate_gini(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    # Gini coefficient of `values` under each column of `weights`.
+    order = np.argsort(values)
+    weights = weights[order]
+    cumw = np.cumsum(weights, axis=0)
+    cumxw = np.cumsum(values[order][:, None] * weights, axis=0)
+    return np.sum(cumxw[1:] * cumw[:-1] - cumxw[:-1] * cumw[1:], axis=0) / (
+        cumxw[-1] * cumw[-1]
+    )
+
+
+class ReplicateWeights:
+    """Bootstrap replicate weights, from resampling households.
+
+    In each of `replicates` replicates, a household's weight is multiplied
+    by the number of times it is drawn when as many households as the
+    survey holds are drawn with replacement. The (rows x replicates) weight
+    matrices are built once per entity, so each metric is one matrix
+    operation over all replicates of a simulation.
+    """
+
+    def __init__(
+        self, baseline: BaselineCache, replicates: int = 100, seed: int = 0
+    ):
+        self.baseline = baseline
+        self.replicates = replicates
+        households = len(baseline.calc("household_id"))
+        self.factors = (
+            np.random.default_rng(seed)
+            .multinomial(
+                households, np.full(households, 1 / households), replicates
+            )
+            .T
+        )
+        self.matrices = {}
+        self.baseline_levels = self.levels(baseline)
+
+    def _household_rows(self, entity: str) -> np.ndarray:
+        # Each row of the entity's household's index.
+        household_ids = np.array(self.baseline.calc("household_id"))
+        if entity == "household":
+            return np.arange(len(household_ids))
+        person_rows = _positions(
+            household_ids,
+            np.array(self.baseline.calc("household_id", map_to="person")),
+        )
+        if entity == "person":
+            return person_rows
+        ids = np.array(self.baseline.calc(f"{entity}_id"))
+        rows = np.empty(len(ids), dtype=int)
+        rows[
+            _positions(
+                ids,
+                np.array(self.baseline.calc(f"{entity}_id", map_to="person")),
+            )
+        ] = person_rows
+        return rows
+
+    def weights(self, series, entity: str) -> np.ndarray:
+        # Reforms leave weights unchanged, so one matrix serves every
+        # simulation.
+        if entity not in self.matrices:
+            self.matrices[entity] = (
+                np.array(series.weights)[:, None]
+                * self.factors[self._household_rows(entity)]
+            )
+        return self.matrices[entity]
+
+    def levels(self, sim) -> dict:
+        levels = {}
+        for metric, variable in (
+            ("poverty", "in_poverty_bhc"),
+            ("deep_poverty", "in_deep_poverty_bhc"),
+        ):
+            flag = sim.calc(variable, map_to="person")
+            weights = self.weights(flag, "person")
+            levels[metric] = np.array(flag) @ weights / weights.sum(axis=0)
+        income = sim.calc("household_net_income", map_to="person")
+        levels["income"] = np.array(income)
+        levels["gini"] = replicate_gini(
+            levels["income"], self.weights(income, "person")
+        )
+        net_income = sim.calc("net_income")
+        entity = _variables()["net_income"].entity.key
+        levels["net_income"] = np.array(net_income) @ self.weights(
+            net_income, entity
+        )
+        return levels
+
+    def results(self, reform_sim) -> dict:
+        """Each evaluate_scenario metric in every replicate."""
+        baseline = self.baseline_levels
+        reform = self.levels(reform_sim)
+        weights = self.matrices["person"]
+        gain = reform["income"] - baseline["income"]
+        people = weights.sum(axis=0)
+
+        def change(metric):
+            return (reform[metric] - baseline[metric]) / baseline[metric]
+
+        return {
+            "Poverty change": change("poverty"),
+            "Deep poverty change": change("deep_poverty"),
+            "Winners": (gain > 1) @ weights / people,
+            "Losers": (gain < -1) @ weights / people,
+            "Inequality change": change("gini"),
+            "Net cost": reform["net_income"] - baseline["net_income"],
+        }
+
+    def intervals(self, reform_sim, level: float = 0.95) -> dict:
+        # Percentile bootstrap bounds, as "<metric> lower" and "<metric>
+        # upper".
+        bounds = {}
+        for metric, values in self.results(reform_sim).items():
+            lower, upper = np.quantile(
+                values, [(1 - level) / 2, (1 + level) / 2]
+            )
+            bounds[f"{metric} lower"] = lower
+            bounds[f"{metric} upper"] = upper
+        return bounds